@@ -1,15 +1,431 @@
 import re
-from typing import Dict, List, Optional, Union, Any
+import string
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from itertools import repeat
+from operator import attrgetter, itemgetter
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Pattern, Tuple, Union, Any
+
+# Words that directly suggest data modification, matched against the
+# whitespace-separated words of a question so "drop-off" or "update-time"
+# are not mistaken for them
+_UNSAFE_KEYWORDS = frozenset({
+    "insert", "update", "delete", "drop", "truncate", "alter", "create",
+    "modify", "remove", "destroy", "wipe", "erase"
+})
+
+# Common phrases that suggest data modification, as one compiled alternation;
+# they also catch keywords attached to punctuation, as in "(delete the"
+_UNSAFE_RE = re.compile("|".join((
+    r"add\s+(?:a\s+)?new",
+    r"delete\s+(?:all|the)",
+    r"remove\s+(?:all|the)",
+    r"update\s+(?:all|the)",
+    r"modify\s+(?:all|the)",
+    r"change\s+(?:all|the)",
+    r"drop\s+(?:all|the)",
+)))
+
+# Keyword vocabulary for query analysis, by category. Intent categories are
+# listed in priority order: when several match, the first one wins.
+_INTENTS = ("COUNT", "AVERAGE", "SUM", "MAX", "MIN", "DISTINCT")
+# Intents answered with an aggregate function, the ones among them that
+# prefer a numeric column, and the SQL function each one maps to
+_AGGREGATE_INTENTS = frozenset(_INTENTS[:5])
+_NUMERIC_AGGREGATE_INTENTS = frozenset(_INTENTS[1:5])
+_AGGREGATE_FUNCTIONS = {
+    "COUNT": "COUNT",
+    "AVERAGE": "AVG",
+    "SUM": "SUM",
+    "MAX": "MAX",
+    "MIN": "MIN"
+}
+_ANALYZE_KEYWORDS = {
+    "COUNT": ["how many", "number of", "count of", "total number", "what is the count"],
+    "AVERAGE": ["average", "averages", "avg", "mean", "typical"],
+    "SUM": ["sum", "total", "totals", "add up", "combined"],
+    "MAX": ["maximum", "max", "highest", "largest", "most"],
+    "MIN": ["minimum", "min", "lowest", "smallest", "least"],
+    "DISTINCT": ["unique", "distinct", "different"],
+    "GROUP": ["group by", "per", "each", "by", "for each", "aggregated by", "broken down by"],
+    "ORDER": [
+        "order by", "sort by", "sorted by", "arrange by", "rank by",
+        "highest", "lowest", "most", "least", "ascending", "descending", "alphabetical"
+    ],
+    "DESC": ["descending", "highest", "most", "top", "max", "maximum", "largest", "greatest"],
+    "COND": [
+        "where", "if", "when", "with", "that have", "that has",
+        "greater than", "less than", "equal to", "more than", "fewer than",
+        "before", "after", "between", "since", "until",
+        "like", "contains", "matches", "starts with", "ends with",
+        "in the range", "within", "outside", "excluding", "including"
+    ],
+    "TIME": [
+        "when", "date", "time", "year", "years", "month", "months", "day", "days",
+        "hour", "hours", "minute", "minutes", "second", "seconds",
+        "week", "weeks", "quarter", "quarters", "recent", "last", "this", "previous", "next",
+        "current", "past", "future", "today", "yesterday", "tomorrow",
+        "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"
+    ],
+}
+
+# Keywords that need more than a literal match
+_ANALYZE_PATTERNS = [
+    (r"top\s+\d+", {"ORDER", "DESC"}),
+    (r"bottom\s+\d+", {"ORDER"}),
+    (r"from(?=.*\bto\b)", {"COND"}),
+]
+
+
+# One bit per keyword category, so the categories of a query fold into an int
+_BIT = {category: 1 << i for i, category in enumerate(_ANALYZE_KEYWORDS)}
+
+# The intents lead _ANALYZE_KEYWORDS in priority order, so they own the lowest
+# bits and the lowest bit set under this mask picks the winning intent
+_INTENT_MASK = (1 << len(_INTENTS)) - 1
+assert all(_BIT[name] == 1 << i for i, name in enumerate(_INTENTS))
+_INTENT_BY_INDEX = (*_INTENTS, "SELECT")
+
+
+def _build_analyze_regex():
+    """
+    Split the analysis keywords into single words, looked up among the query's
+    tokens, and multi-word phrases and patterns, compiled into one alternation regex.
+    
+    Each regex alternative gets its own named group, mapped to the bitmask of the
+    categories it signals (see _BIT). A phrase also carries the categories of any keyword it contains
+    (e.g. "order by" implies "by"), since matching the phrase consumes them.
+    
+    Returns:
+        Tuple of (compiled phrase regex, dict mapping group name to category bitmask,
+        dict mapping single-word keyword to category bitmask, set of the words
+        a phrase or pattern can start with)
+    """
+    categories = {}
+    for category, keywords in _ANALYZE_KEYWORDS.items():
+        for keyword in keywords:
+            categories.setdefault(keyword, set()).add(category)
+    for phrase, cats in categories.items():
+        for keyword, keyword_cats in categories.items():
+            if keyword != phrase and re.search(rf"\b{re.escape(keyword)}\b", phrase):
+                cats |= keyword_cats
+    
+    word_bits = {keyword: sum(_BIT[category] for category in cats)
+                 for keyword, cats in categories.items() if " " not in keyword}
+    
+    # Longest alternatives first so longer phrases win over the phrases inside them
+    alternatives = list(_ANALYZE_PATTERNS)
+    alternatives += [(re.escape(keyword), cats)
+                     for keyword, cats in sorted(categories.items(), key=lambda kv: -len(kv[0]))
+                     if " " in keyword]
+    
+    groups = {}
+    parts = []
+    lead_words = set()
+    for i, (pattern, cats) in enumerate(alternatives):
+        groups[f"k{i}"] = sum(_BIT[category] for category in cats)
+        parts.append(f"(?P<k{i}>{pattern})")
+        # Every alternative starts with a literal word
+        lead_words.add(re.match(r"\w+", pattern).group())
+    regex = re.compile(rf"\b(?:{'|'.join(parts)})\b")
+    return regex, groups, word_bits, frozenset(lead_words)
+
+
+_ANALYZE_RE, _ANALYZE_GROUPS, _KEYWORD_BITS, _PHRASE_LEAD_WORDS = _build_analyze_regex()
+_LIMIT_RE = re.compile(r"\b(?:top|first|last|limit to|show only|display only)\s+(\d+)")
+# Leading words of _LIMIT_RE; the regex only needs to run when one is a token
+_LIMIT_WORDS = frozenset({"top", "first", "last", "limit", "show", "display"})
+
+# What may follow a column name to form a WHERE condition, with the operators
+# each form yields. "greater than"/"less than" with a single space also count
+# as an equality check, so those forms come first and yield both operators.
+_CONDITION_FORMS = (
+    (r"(?:is|equals|=)\s+(\w+)", ("=",)),
+    (r"greater than\s+(\d+)", ("=", ">")),
+    (r"less than\s+(\d+)", ("=", "<")),
+    (r"(?:after|before)\s+(\d+)", ("=",)),
+    (r"(?:greater\s+than|>|more\s+than)\s+(\d+)", (">",)),
+    (r"(?:less\s+than|<|fewer\s+than)\s+(\d+)", ("<",)),
+    (r"(?:contains|like|matches|with)\s+(\w+)", ("LIKE",)),
+)
+_CONDITION_TAIL_RE = re.compile(r"\s+(?:%s)" % "|".join(
+    f"(?P<c{i}>{form})" for i, (form, _) in enumerate(_CONDITION_FORMS)
+))
+_CONDITION_OPERATORS = {f"c{i}": operators for i, (_, operators) in enumerate(_CONDITION_FORMS)}
+
+# Maps punctuation (except "_", which belongs to schema names) to spaces for tokenizing
+_TOKEN_TABLE = str.maketrans({char: " " for char in string.punctuation if char != "_"})
+
+
+# Column data types that can be aggregated numerically or compared as points in time
+_NUMERIC_TYPES = frozenset({"integer", "number", "float", "decimal"})
+_TEMPORAL_TYPES = frozenset({"timestamp", "date", "datetime"})
+
+# Shared empty metadata, the default for agents and generate_sql
+_EMPTY_METADATA: Mapping[str, Any] = MappingProxyType({})
+
+# Answer to questions refused as data modification, shared by all of them
+_UNSAFE_RESULT: Mapping[str, Any] = MappingProxyType({
+    "sql": None,
+    "safe": False,
+    "explanation": "This request appears to involve data modification which is not allowed for safety reasons.",
+    "reasoning": "The request contains terms that suggest data modification (INSERT, UPDATE, DELETE, etc.) which could potentially alter or destroy data."
+})
+
+# Text columns pulled into the query whenever it asks for a LIKE match
+_LIKE_COLUMNS = frozenset({"email", "name", "description"})
+
+# Kinds of SELECT entry
+_ALL, _AGG, _COL = 0, 1, 2
+
+
+class SelectCol(NamedTuple):
+    """An entry of the SELECT clause."""
+    kind: int
+    table: str
+    column: str
+    function: str = ""
+    alias: str = ""
+
+
+class WhereCond(NamedTuple):
+    """A single comparison of the WHERE clause."""
+    table: str
+    column: str
+    operator: str
+    value: Any
+
+
+class GroupCol(NamedTuple):
+    """A column of the GROUP BY clause."""
+    table: str
+    column: str
+
+
+class OrderCol(NamedTuple):
+    """A column of the ORDER BY clause with its direction."""
+    table: str
+    column: str
+    direction: str
+
+
+class TableSchema(NamedTuple):
+    """A table of the schema, with its columns stored as parallel tuples."""
+    name: str
+    lower: str
+    singular: Optional[str]
+    words: FrozenSet[str]
+    column_names: Tuple[str, ...]
+    column_lower: Tuple[str, ...]
+    column_words: Tuple[FrozenSet[str], ...]
+    data_types: Tuple[str, ...]
+    descriptions: Tuple[str, ...]
+    column_refs: Tuple[Dict[str, str], ...]
+
+
+def _table_schema(table_name: str, columns: List[Dict[str, Any]]) -> TableSchema:
+    """
+    Convert a table of a dict schema into a TableSchema.
+    
+    Args:
+        table_name: Name of the table
+        columns: List of column information dicts
+        
+    Returns:
+        TableSchema with lowercased names and descriptions, the words longer
+        than three characters used for partial matches, and the column entries
+        shared by every query that selects them (treat as read-only)
+    """
+    # Names and types repeat across tables and queries (id, integer, ...), so
+    # they are interned to share one string object each
+    table_name = sys.intern(table_name)
+    table_lower = table_name.lower()
+    column_names = tuple(sys.intern(col["name"]) for col in columns)
+    column_lower = tuple(sys.intern(name.lower()) for name in column_names)
+    data_types = tuple(sys.intern(col.get("data_type", "")) for col in columns)
+    return TableSchema(
+        name=table_name,
+        lower=table_lower,
+        singular=table_lower[:-1] if table_lower.endswith('s') else None,
+        words=frozenset(word for word in table_lower.split('_') if len(word) > 3),
+        column_names=column_names,
+        column_lower=column_lower,
+        column_words=tuple(frozenset(word for word in name.split('_') if len(word) > 3)
+                           for name in column_lower),
+        data_types=data_types,
+        descriptions=tuple(col.get("description", "").lower() for col in columns),
+        column_refs=tuple({"table": table_name, "column": name, "data_type": data_type}
+                          for name, data_type in zip(column_names, data_types)),
+    )
+
+
+class QueryComponents(NamedTuple):
+    """The clauses a SQL query is generated from."""
+    select: List[SelectCol]
+    tables: List[str]
+    where: List[WhereCond]
+    group_by: List[GroupCol]
+    order_by: List[OrderCol]
+    limit: Optional[int]
+
+
+_column_of = attrgetter("column")
+
+# Wording of WHERE operators in explanations
+_OPERATOR_TEXT = {
+    "=": "equals",
+    ">": "is greater than",
+    "<": "is less than",
+    ">=": "is greater than or equal to",
+    "<=": "is less than or equal to",
+    "!=": "is not equal to"
+}
+
+# Wording of ORDER BY directions in explanations
+_DIRECTION_TEXT = {"DESC": "descending", "ASC": "ascending"}
+
+# Safety considerations that close every reasoning text
+_SAFETY_SUFFIX = (
+    " The query is read-only (SELECT) to ensure data safety and prevent any database modifications."
+    " Parameters should be properly escaped when executing this query to prevent SQL injection."
+)
+
+# SQL format templates by clause shape (has_where, has_group, has_order, has_limit)
+_SQL_TEMPLATES: Dict[Tuple[bool, bool, bool, bool], str] = {}
+
+
+def _build_sql_template(has_where: bool, has_group: bool, has_order: bool, has_limit: bool) -> str:
+    """
+    Build the format template for a SQL statement with the given clauses.
+    
+    Args:
+        has_where: Whether the statement has a WHERE clause
+        has_group: Whether the statement has a GROUP BY clause
+        has_order: Whether the statement has an ORDER BY clause
+        has_limit: Whether the statement has a LIMIT clause
+        
+    Returns:
+        Template with select, tables, where, group_by, order_by and limit fields
+    """
+    parts = ["SELECT\n    {select}\nFROM\n    {tables}"]
+    if has_where:
+        parts.append("\nWHERE\n    {where}")
+    if has_group:
+        parts.append("\nGROUP BY\n    {group_by}")
+    if has_order:
+        parts.append("\nORDER BY\n    {order_by}")
+    if has_limit:
+        parts.append("\nLIMIT {limit}")
+    parts.append(";")
+    return "".join(parts)
+
+
+@lru_cache(maxsize=1024)
+def _condition_sweep(col_names: Tuple[str, ...]) -> Pattern:
+    """
+    Compile the regex finding every occurrence of the given column names.
+    
+    Cached at module level, so agents built for the same schema share the patterns.
+    
+    Args:
+        col_names: Sorted lowercased column names
+        
+    Returns:
+        Compiled pattern whose group 1 is the column name found at each match
+    """
+    # Longest names first; the lookahead lets occurrences overlap
+    names = "|".join(map(re.escape, sorted(col_names, key=len, reverse=True)))
+    return re.compile(f"(?=({names}))")
+
+
+@dataclass(frozen=True)
+class _QueryContext:
+    """Per-call views of the question, computed once and shared by every stage."""
+    raw: str
+    lower: str
+    tokens: frozenset
+    words: Tuple[str, ...]
+
+
+@lru_cache(maxsize=1024)
+def _analyze_text(query_lower: str, tokens: FrozenSet[str]) -> Tuple[str, bool, bool, str, bool, Optional[int], bool, bool]:
+    """
+    Extract the intent and structural flags of a lowercased question.
+    
+    The result only depends on the question text, so it is cached at module
+    level and shared by every agent, whatever its schema.
+    
+    Args:
+        query_lower: The lowercased question
+        tokens: Its punctuation-stripped words
+        
+    Returns:
+        Tuple of (intent, has_grouping, has_ordering, order_direction,
+        has_limit, limit_value, has_conditions, is_time_based)
+    """
+    # Collect every keyword category the query mentions: single words by
+    # set intersection with its tokens, phrases in one regex pass
+    mask = 0
+    for word in _KEYWORD_BITS.keys() & tokens:
+        mask |= _KEYWORD_BITS[word]
+    if not _PHRASE_LEAD_WORDS.isdisjoint(tokens):
+        for match in _ANALYZE_RE.finditer(query_lower):
+            mask |= _ANALYZE_GROUPS[match.lastgroup]
+    
+    # The first intent in priority order wins; SELECT is the default.
+    # Isolating the lowest set intent bit avoids testing each intent in turn
+    intent_bits = mask & _INTENT_MASK
+    intent = _INTENT_BY_INDEX[(intent_bits & -intent_bits).bit_length() - 1]
+    
+    has_grouping = bool(mask & _BIT["GROUP"])
+    has_ordering = bool(mask & _BIT["ORDER"])
+    order_direction = "DESC" if has_ordering and mask & _BIT["DESC"] else "ASC"
+    
+    # Limit detection needs the captured number, so it stays a separate pattern
+    has_limit = False
+    limit_value = None
+    if not _LIMIT_WORDS.isdisjoint(tokens):
+        limit_match = _LIMIT_RE.search(query_lower)
+        if limit_match:
+            has_limit = True
+            limit_value = int(limit_match.group(1))
+    
+    has_conditions = bool(mask & _BIT["COND"])
+    is_time_based = bool(mask & _BIT["TIME"])
+    
+    return (intent, has_grouping, has_ordering, order_direction,
+            has_limit, limit_value, has_conditions, is_time_based)
+
 
 class QueryGPT:
     """
     An agent that converts natural language questions to SQL queries.
     Similar to Uber's QueryGPT, this agent analyzes the question and database schema
     to generate appropriate SQL.
+    
+    Query processing is pure CPU work with no network calls besides the
+    optional database connection. An agent also keeps conversational state
+    (recent tables, result caches), so it is not safe to share between
+    threads without external locking.
     """
     
+    # Bounds for the result caches used by process_query
+    CACHE_SIZE = 256
+    SEMANTIC_CACHE_SIZE = 1024
+    SEMANTIC_THRESHOLD = 0.95
+    # Bound for the per-question memo of matched tables and columns
+    MATCH_CACHE_SIZE = 1024
+    # Number of recently used tables kept as context for follow-up questions
+    RECENT_TABLES = 5
+    
     def __init__(self, schema: Optional[Dict[str, List[Dict[str, Any]]]] = None, 
-                 db_config: Optional[Dict[str, str]] = None):
+                 db_config: Optional[Dict[str, str]] = None,
+                 embedder: Optional[Callable[[str], Any]] = None):
         """
         Initialize the QueryGPT agent.
         
@@ -22,13 +438,27 @@ class QueryGPT:
                 - user: Database username
                 - password: Database password
                 - database: Database name
+            embedder: Optional callable mapping a question to an embedding vector.
+                When given, questions whose embedding is close enough to a
+                previously answered one reuse its result (requires numpy).
         """
         self.schema = schema
         self.db_config = db_config
         self.connection = None
         self.table_descriptions = {}
-        self.metadata = {}
-        self.recently_used_tables = []
+        self._table_desc_tokens: Dict[str, FrozenSet[str]] = {}
+        self._columns_by_table = {}
+        self.metadata: Mapping[str, Any] = _EMPTY_METADATA
+        # Snapshot of the metadata contents, to detect metadata modified in place
+        self._metadata_fingerprint: tuple = ()
+        self._recent_tables: "OrderedDict[str, None]" = OrderedDict()
+        self.embedder = embedder
+        self._exact_cache: "OrderedDict[str, Tuple[Mapping[str, Any], Tuple[str, ...]]]" = OrderedDict()
+        self._join_clauses: Dict[Tuple[str, str], Optional[str]] = {}
+        self._schema_matches: "OrderedDict[str, Tuple[Tuple[str, ...], Tuple[Dict[str, Any], ...]]]" = OrderedDict()
+        self._cache_vecs = None
+        self._cache_entries: List[Tuple[Mapping[str, Any], Tuple[str, ...]]] = []
+        self._index_schema()
         
     def set_schema(self, schema: Dict[str, List[Dict[str, Any]]]):
         """
@@ -38,219 +468,286 @@ class QueryGPT:
             schema: Dict mapping table names to lists of column information
         """
         self.schema = schema
-        # Extract table descriptions for better matching
-        for table_name, columns in schema.items():
-            columns_str = ", ".join([col["name"] for col in columns])
-            self.table_descriptions[table_name] = f"Table '{table_name}' containing columns: {columns_str}"
+        self._index_schema()
+        self.clear_cache()
+        # Table descriptions for better matching are built on first use
+        self._columns_by_table = schema
+        self.table_descriptions = {}
+        self._table_desc_tokens = {}
+    
+    def get_table_description(self, table_name: str) -> str:
+        """
+        Get the description of a table set via set_schema, computing it on first access.
+        
+        Args:
+            table_name: Name of the table
+            
+        Returns:
+            Description listing the table's columns, or "" for unknown tables
+        """
+        description = self.table_descriptions.get(table_name)
+        if description is None:
+            columns = self._columns_by_table.get(table_name)
+            if columns is None:
+                return ""
+            columns_str = ", ".join(map(itemgetter("name"), columns))
+            description = f"Table '{table_name}' containing columns: {columns_str}"
+            self.table_descriptions[table_name] = description
+        return description
     
-    def set_metadata(self, metadata: Dict[str, Any]):
+    def _description_tokens(self, table_name: str) -> FrozenSet[str]:
+        """
+        Get the words that describe a table set via set_schema: its name and column names.
+        
+        The fixed wording of the description ("Table ... containing columns")
+        is left out, so it cannot match every table.
+        
+        Args:
+            table_name: Name of the table
+            
+        Returns:
+            Set of lowercased words, empty for unknown tables
+        """
+        columns = self._columns_by_table.get(table_name)
+        if columns is None:
+            return frozenset()
+        text = " ".join([table_name, *map(itemgetter("name"), columns)]).lower()
+        return frozenset(text.translate(_TOKEN_TABLE).split())
+    
+    def set_metadata(self, metadata: Mapping[str, Any]):
         """
         Set additional metadata about the database for improved query generation.
         
         Args:
             metadata: Dict containing metadata like table relationships, common joins, etc.
         """
+        if metadata is _EMPTY_METADATA and self.metadata is _EMPTY_METADATA:
+            return
         self.metadata = metadata
+        self._metadata_fingerprint = _metadata_fingerprint(metadata)
+        self.clear_cache()
+    
+    def clear_cache(self):
+        """Drop all cached query results, e.g. after the schema or metadata changed."""
+        self._exact_cache.clear()
+        self._join_clauses.clear()
+        self._schema_matches.clear()
+        self._cache_vecs = None
+        self._cache_entries = []
     
-    def process_query(self, user_question: str) -> Dict[str, Any]:
+    def clear_context(self):
+        """Forget recently used tables, so the next question is answered without prior context."""
+        self._recent_tables.clear()
+    
+    def process_query(self, user_question: str) -> Mapping[str, Any]:
         """
         Process a natural language question and convert it to SQL.
         
+        Results are cached per question (case and whitespace are
+        ignored), plus by embedding similarity when an embedder is configured.
+        A cache hit returns the stored result as-is, including the reasoning
+        written for the question that populated the entry. Every result is a
+        read-only mapping, shared by all hits on its cache entry; copy one with
+        dict() before modifying it.
+        
         Args:
             user_question: Natural language question from the user
             
         Returns:
-            Dict containing the SQL query, explanation, and reasoning
+            Read-only mapping containing the SQL query, explanation, and reasoning
             
         Raises:
             ValueError: If schema is not provided or invalid
             ConnectionError: If database connection fails
         """
+        # Lowercase, collapse whitespace and tokenize the question once for all stages
+        words = tuple(user_question.lower().split())
+        lower = " ".join(words)
+        ctx = _QueryContext(user_question, lower,
+                            frozenset(lower.translate(_TOKEN_TABLE).split()),
+                            words)
+        
+        # Check if the query might be unsafe, before touching the schema or database
+        if self._is_unsafe_query(ctx):
+            return _UNSAFE_RESULT
+        
         # Validate schema
         if not self.schema or not isinstance(self.schema, dict):
             raise ValueError("Valid schema information is required")
-            
-        # Validate database connection
-        if self.db_config:
+        
+        # Validate database connection, opened once and reused across questions
+        if self.db_config and (self.connection is None or self.connection.closed):
             try:
                 import psycopg2
                 self.connection = psycopg2.connect(**self.db_config)
             except Exception as e:
                 raise ConnectionError(f"Failed to connect to database: {str(e)}")
         
-        # Check if the query might be unsafe
-        if self._is_unsafe_query(user_question):
-            return {
-                "sql": None,
-                "safe": False,
-                "explanation": "This request appears to involve data modification which is not allowed for safety reasons.",
-                "reasoning": "The request contains terms that suggest data modification (INSERT, UPDATE, DELETE, etc.) which could potentially alter or destroy data."
-            }
+        # Reuse the result of an earlier identical or similar question
+        cache_key = lower
+        query_vec = None
+        cached = self._exact_cache.get(cache_key)
+        if cached is not None:
+            # Keep frequently asked questions from aging out of the LRU
+            self._exact_cache.move_to_end(cache_key)
+        elif self.embedder is not None:
+            query_vec = self._embed(user_question)
+            cached = self._semantic_lookup(query_vec)
+        if cached is not None:
+            result, tables = cached
+            self._remember_tables(tables)
+            return result
         
         # Step 1: Analyze the query to understand what it's asking for
-        query_analysis = self._analyze_query(user_question)
+        query_analysis = self._analyze_query(ctx)
         
         # Step 2: Identify relevant tables and columns
-        tables, columns = self._identify_schema_elements(query_analysis)
+        tables, columns = self._identify_schema_elements(ctx, query_analysis)
         
         # Step 3: Determine query type and components
-        query_type, query_components = self._determine_query_components(query_analysis, tables, columns)
-        
-        # Step 4: Generate the SQL query
-        sql_query = self._generate_sql(query_type, query_components)
+        query_type, query_components = self._determine_query_components(ctx, query_analysis, tables, columns)
         
-        # Step 5: Generate explanation and reasoning
-        explanation = self._generate_explanation(query_type, query_components)
-        reasoning = self._generate_reasoning(user_question, query_analysis, query_type, query_components)
-        
-        # Remember recently used tables for context
-        self.recently_used_tables = tables[:5]  # Keep track of up to 5 tables
+        # Step 4: Generate the SQL query with its explanation and reasoning
+        sql_query, explanation, reasoning = self._render(
+            query_type, query_components, query_analysis, user_question
+        )
         
-        return {
+        result = MappingProxyType({
             "sql": sql_query,
             "safe": True,
             "explanation": explanation,
             "reasoning": reasoning
-        }
+        })
+        
+        # Results that fell back on previous context or compare against the
+        # current time would go stale, so only self-contained ones are cached
+        if not query_analysis["used_recent_tables"] and not query_analysis["is_time_based"]:
+            self._cache_store(cache_key, query_vec, user_question, result, tables)
+        
+        # Remember recently used tables for context
+        self._remember_tables(tables)
+        
+        return result
+    
+    @property
+    def recently_used_tables(self) -> List[str]:
+        """Recently used tables, most recent first."""
+        return list(reversed(self._recent_tables))
     
-    def _is_unsafe_query(self, query: str) -> bool:
+    def _remember_tables(self, tables: List[str]):
         """
-        Check if the query might be unsafe (attempting to modify data).
+        Move the tables of the last query to the front of the recent tables LRU.
         
         Args:
-            query: The natural language query
+            tables: Tables used by the query, most relevant first
+        """
+        recent = self._recent_tables
+        # Insert in reverse so the query's first table ends up most recent
+        for table_name in reversed(tables[:self.RECENT_TABLES]):
+            recent[table_name] = None
+            recent.move_to_end(table_name)
+        while len(recent) > self.RECENT_TABLES:
+            recent.popitem(last=False)
+    
+    def _embed(self, question: str):
+        """
+        Embed a question as a unit-length vector for similarity lookups.
+        
+        Args:
+            question: The natural language question
             
         Returns:
-            Bool indicating if the query appears unsafe
+            Normalized 1-D numpy array
+        """
+        import numpy as np
+        vec = np.asarray(self.embedder(question), dtype=np.float64).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+    
+    def _semantic_lookup(self, query_vec) -> Optional[Tuple[Dict[str, Any], List[str]]]:
         """
-        query_lower = query.lower()
+        Find the cached result whose question embedding is most similar to the query.
         
-        # Check for explicit data modification keywords
-        unsafe_keywords = [
-            "insert", "update", "delete", "drop", "truncate", "alter", "create",
-            "modify", "remove", "destroy", "wipe", "erase"
-        ]
+        Args:
+            query_vec: Normalized embedding of the incoming question
+            
+        Returns:
+            Cached (result, tables) entry if similarity exceeds SEMANTIC_THRESHOLD, else None
+        """
+        if self._cache_vecs is None:
+            return None
+        # Stored vectors are normalized, so one matrix-vector product gives all cosines
+        similarities = self._cache_vecs @ query_vec
+        best = int(similarities.argmax())
+        if similarities[best] > self.SEMANTIC_THRESHOLD:
+            return self._cache_entries[best]
+        return None
+    
+    def _cache_store(self, key: str, query_vec, question: str,
+                     result: Mapping[str, Any], tables: List[str]):
+        """
+        Remember a result in the exact cache and, if enabled, the semantic cache.
         
-        # Common patterns that suggest data modification
-        unsafe_patterns = [
-            r"add\s+(?:a\s+)?new",
-            r"delete\s+(?:all|the)",
-            r"remove\s+(?:all|the)",
-            r"update\s+(?:all|the)",
-            r"modify\s+(?:all|the)",
-            r"change\s+(?:all|the)",
-            r"drop\s+(?:all|the)",
-        ]
+        Args:
+            key: Normalized question used for exact matching
+            query_vec: Normalized embedding of the question, if already computed
+            question: Original question, embedded when query_vec is None
+            result: Read-only result returned by process_query, shared with cache hits
+            tables: Tables used for the result, restored into recent context on hits
+        """
+        entry = (result, tuple(tables))
+        self._exact_cache[key] = entry
+        self._exact_cache.move_to_end(key)
+        if len(self._exact_cache) > self.CACHE_SIZE:
+            self._exact_cache.popitem(last=False)
+        
+        if self.embedder is None:
+            return
+        import numpy as np
+        if query_vec is None:
+            query_vec = self._embed(question)
+        if self._cache_vecs is None:
+            self._cache_vecs = query_vec[np.newaxis, :]
+        else:
+            self._cache_vecs = np.vstack((self._cache_vecs, query_vec))
+        self._cache_entries.append(entry)
+        # Evict the oldest entries once the semantic cache is full
+        if len(self._cache_entries) > self.SEMANTIC_CACHE_SIZE:
+            self._cache_vecs = self._cache_vecs[1:]
+            self._cache_entries = self._cache_entries[1:]
+    
+    def _is_unsafe_query(self, ctx: _QueryContext) -> bool:
+        """
+        Check if the query might be unsafe (attempting to modify data).
         
+        Args:
+            ctx: The prepared natural language query
+            
+        Returns:
+            Bool indicating if the query appears unsafe
+        """
         # Check for keywords that directly suggest data modification
-        for keyword in unsafe_keywords:
-            if keyword in query_lower.split():
-                return True
+        if not _UNSAFE_KEYWORDS.isdisjoint(ctx.words):
+            return True
         
         # Check for patterns that might suggest data modification
-        for pattern in unsafe_patterns:
-            if re.search(pattern, query_lower):
-                return True
-                
-        return False
+        return _UNSAFE_RE.search(ctx.lower) is not None
     
-    def _analyze_query(self, query: str) -> Dict[str, Any]:
+    def _analyze_query(self, ctx: _QueryContext) -> Dict[str, Any]:
         """
         Analyze the query to extract its key components and intent with enhanced NLP.
         
+        The text analysis itself is memoized by _analyze_text; each call gets a
+        fresh dict, since later stages annotate it.
+        
         Args:
-            query: The natural language query
+            ctx: The prepared natural language query
             
         Returns:
             Dict containing query analysis information
         """
-        query_lower = query.lower()
-        
-        # Enhanced intent detection with pattern matching
-        intent = "SELECT"  # Default intent
-        
-        # More comprehensive intent detection
-        intent_patterns = {
-            "COUNT": [
-                r"how many", r"number of", r"count of", r"total number",
-                r"how many.*are there", r"what is the count"
-            ],
-            "AVERAGE": [
-                r"average", r"avg", r"mean", r"typical", 
-                r"what is the average", r"calculate.*average"
-            ],
-            "SUM": [
-                r"sum", r"total", r"add up", r"combined",
-                r"what is the total", r"calculate.*sum"
-            ],
-            "MAX": [
-                r"maximum", r"max", r"highest", r"largest", r"most",
-                r"what is the maximum", r"find.*highest"
-            ],
-            "MIN": [
-                r"minimum", r"min", r"lowest", r"smallest", r"least",
-                r"what is the minimum", r"find.*lowest"
-            ],
-            "DISTINCT": [
-                r"unique", r"distinct", r"different",
-                r"list of unique", r"show distinct"
-            ]
-        }
-        
-        for intent_type, patterns in intent_patterns.items():
-            if any(re.search(pattern, query_lower) for pattern in patterns):
-                intent = intent_type
-                break
-        
-        # Enhanced component detection
-        has_grouping = bool(re.search(
-            r"group by|per|each|by|for each|aggregated by|broken down by", 
-            query_lower
-        ))
-        
-        # Improved ordering detection
-        has_ordering = bool(re.search(
-            r"order by|sort by|sorted by|arrange by|rank by|"
-            r"top \d+|bottom \d+|highest|lowest|most|least|"
-            r"ascending|descending|alphabetical", 
-            query_lower
-        ))
-        
-        order_direction = "DESC" if re.search(
-            r"descending|highest|most|top|max|maximum|largest|greatest", 
-            query_lower
-        ) else "ASC"
-        
-        # Enhanced limit detection
-        has_limit = False
-        limit_value = None
-        limit_match = re.search(
-            r"(?:top|first|last|limit to|show only|display only)\s+(\d+)", 
-            query_lower
-        )
-        if limit_match:
-            has_limit = True
-            limit_value = int(limit_match.group(1))
-        
-        # Advanced condition parsing
-        has_conditions = bool(re.search(
-            r"where|if|when|with|that (?:have|has)|"
-            r"greater than|less than|equal to|more than|fewer than|"
-            r"before|after|between|from.*to|since|until|"
-            r"like|contains|matches|starts with|ends with|"
-            r"in the range|within|outside|excluding|including", 
-            query_lower
-        ))
-        
-        # Improved time detection
-        is_time_based = bool(re.search(
-            r"when|date|time|year|month|day|hour|minute|second|"
-            r"week|quarter|recent|last|this|previous|next|"
-            r"current|past|future|today|yesterday|tomorrow|"
-            r"monday|tuesday|wednesday|thursday|friday|saturday|sunday", 
-            query_lower
-        ))
-        
+        (intent, has_grouping, has_ordering, order_direction, has_limit,
+         limit_value, has_conditions, is_time_based) = _analyze_text(ctx.lower, ctx.tokens)
         return {
             "intent": intent,
             "has_grouping": has_grouping,
@@ -260,126 +757,149 @@ class QueryGPT:
             "limit_value": limit_value,
             "has_conditions": has_conditions,
             "is_time_based": is_time_based,
-            "original_query": query
+            "used_recent_tables": False,
+            "original_query": ctx.raw
         }
     
-    def _identify_schema_elements(self, query_analysis: Dict[str, Any]) -> tuple:
+    def _index_schema(self):
+        """
+        Precompute the lowercased schema names used to match questions against the schema.
+        """
+        self._tables: List[TableSchema] = []
+        self._tables_by_name: Dict[str, TableSchema] = {}
+        self._column_index: Dict[str, List[int]] = {}
+        if not self.schema or not isinstance(self.schema, dict):
+            return
+        self._tables = [_table_schema(table_name, columns) for table_name, columns in self.schema.items()]
+        self._tables_by_name = {table.name: table for table in self._tables}
+        
+        # Lowercased column name -> positions of the tables that have it
+        for position, table in enumerate(self._tables):
+            for column_name in table.column_lower:
+                positions = self._column_index.setdefault(column_name, [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+    
+    def _identify_schema_elements(self, ctx: _QueryContext,
+                                  query_analysis: Dict[str, Any]) -> tuple:
         """
         Identify relevant tables and columns from the schema based on the query
         using fuzzy matching and semantic analysis.
         
         Args:
+            ctx: The prepared natural language query
             query_analysis: The query analysis dictionary
             
         Returns:
             Tuple of (tables, columns) that are relevant to the query
         """
-        query = query_analysis["original_query"].lower()
+        query = ctx.lower
         
+        # Questions naming their tables match the same way every time, so their
+        # matches are memoized; ones falling back on context are recomputed
+        memo = self._schema_matches.get(query)
+        if memo is not None:
+            self._schema_matches.move_to_end(query)
+            return list(memo[0]), list(memo[1])
+        
+        # Schema names are matched against whole words of the query
+        matched_words = ctx.tokens
+        contains = matched_words.__contains__
+        
+        # Each table and column is added at most once, in order of first match
         relevant_tables = []
         relevant_columns = []
+        seen_columns = set()
+        
+        query_words = ctx.words
+        desc_tokens = self._table_desc_tokens
         
         # Enhanced table matching with fuzzy logic
-        for table_name, columns in self.schema.items():
-            table_lower = table_name.lower()
-            
+        for table in self._tables:
             # Check for exact matches
-            if table_lower in query or (table_lower.endswith('s') and table_lower[:-1] in query):
-                relevant_tables.append(table_name)
+            if contains(table.lower) or (table.singular is not None and contains(table.singular)):
+                relevant_tables.append(table.name)
                 # When table is explicitly mentioned, include all its columns
-                for col in columns:
-                    relevant_columns.append({
-                        "table": table_name,
-                        "column": col["name"],
-                        "data_type": col.get("data_type", "")
-                    })
+                relevant_columns.extend(table.column_refs)
+                seen_columns.update(zip(repeat(table.name), table.column_names))
                 continue
                 
             # Check for partial matches and synonyms
-            table_words = table_lower.split('_')
-            for word in table_words:
-                if len(word) > 3 and word in query:
-                    relevant_tables.append(table_name)
-                    break
+            if not table.words.isdisjoint(matched_words):
+                relevant_tables.append(table.name)
+                continue
                     
-            # Check table descriptions
-            table_desc = self.table_descriptions.get(table_name, "").lower()
-            if any(word in table_desc for word in query.split()):
-                relevant_tables.append(table_name)
+            # Check table descriptions, tokenized once per table
+            table_tokens = desc_tokens.get(table.name)
+            if table_tokens is None:
+                table_tokens = desc_tokens[table.name] = self._description_tokens(table.name)
+            if not table_tokens.isdisjoint(ctx.tokens):
+                relevant_tables.append(table.name)
         
         # If no tables found, use previously used tables or try to infer
-        if not relevant_tables:
-            if self.recently_used_tables:
+        matched_directly = bool(relevant_tables)
+        if not matched_directly:
+            if self._recent_tables:
                 relevant_tables = self.recently_used_tables
+                query_analysis["used_recent_tables"] = True
             else:
-                # Try to find relevant tables based on column mentions
-                for table_name, columns in self.schema.items():
-                    for column in columns:
-                        column_name = column["name"].lower()
-                        if column_name in query:
-                            relevant_tables.append(table_name)
-                            break
-        
-        # Remove duplicates while preserving order
-        relevant_tables = list(dict.fromkeys(relevant_tables))
+                # Try to find relevant tables based on column mentions,
+                # looking the query's words up in the column name index
+                positions = set()
+                for word in matched_words:
+                    positions.update(self._column_index.get(word, ()))
+                relevant_tables = [self._tables[position].name for position in sorted(positions)]
         
         # Ensure we have at least one table
         if not relevant_tables and self.schema:
             # Default to first table if no specific table is identified
-            relevant_tables = [list(self.schema.keys())[0]]
+            relevant_tables = [next(iter(self.schema))]
         
-        # Enhanced column matching
+        # Enhanced column matching, with the per-column calls bound to locals
+        tables_by_name = self._tables_by_name
+        is_like = "like" in query
+        add_column = relevant_columns.append
+        mark_seen = seen_columns.add
         for table_name in relevant_tables:
-            table_columns = self.schema.get(table_name, [])
-            for column in table_columns:
-                column_name = column["name"].lower()
-                
-                # Check for exact matches
-                if column_name in query:
-                    relevant_columns.append({
-                        "table": table_name,
-                        "column": column["name"],
-                        "data_type": column.get("data_type", "")
-                    })
+            table = tables_by_name.get(table_name)
+            if table is None:
+                continue
+            for column, column_name, column_lower, col_words, col_desc in zip(
+                    table.column_refs, table.column_names, table.column_lower,
+                    table.column_words, table.descriptions):
+                key = (table_name, column_name)
+                if key in seen_columns:
                     continue
-                    
-                # Check for partial matches
-                col_words = column_name.split('_')
-                for word in col_words:
-                    if len(word) > 3 and word in query:
-                        relevant_columns.append({
-                            "table": table_name,
-                            "column": column["name"],
-                            "data_type": column.get("data_type", "")
-                        })
-                        break
-                
-                # Check column descriptions
-                col_desc = column.get("description", "").lower()
-                if any(word in col_desc for word in query.split()):
-                    relevant_columns.append({
-                        "table": table_name,
-                        "column": column["name"],
-                        "data_type": column.get("data_type", "")
-                    })
-                
-                # Special handling for LIKE conditions
-                if "like" in query and column_name in ["email", "name", "description"]:
-                    relevant_columns.append({
-                        "table": table_name,
-                        "column": column["name"],
-                        "data_type": column.get("data_type", "")
-                    })
+                if (
+                    # Check for exact matches
+                    contains(column_lower)
+                    # Check for partial matches
+                    or not col_words.isdisjoint(matched_words)
+                    # Check column descriptions
+                    or (col_desc and any(word in col_desc for word in query_words))
+                    # Special handling for LIKE conditions
+                    or (is_like and column_lower in _LIKE_COLUMNS)
+                ):
+                    mark_seen(key)
+                    add_column(column)
+        
+        if matched_directly:
+            matches = self._schema_matches
+            matches[query] = (tuple(relevant_tables), tuple(relevant_columns))
+            if len(matches) > self.MATCH_CACHE_SIZE:
+                matches.popitem(last=False)
         
         return relevant_tables, relevant_columns
     
-    def _determine_query_components(self, query_analysis: Dict[str, Any], 
+    def _determine_query_components(self, ctx: _QueryContext,
+                                   query_analysis: Dict[str, Any], 
                                    tables: List[str], 
                                    columns: List[Dict[str, str]]) -> tuple:
         """
         Determine the query type and components based on the analysis.
         
         Args:
+            ctx: The prepared natural language query
             query_analysis: The query analysis dictionary
             tables: List of relevant tables
             columns: List of relevant columns
@@ -387,7 +907,7 @@ class QueryGPT:
         Returns:
             Tuple of (query_type, query_components)
         """
-        query = query_analysis["original_query"].lower()
+        query = ctx.lower
         
         # Start with a basic SELECT query
         query_type = "SELECT"
@@ -401,16 +921,16 @@ class QueryGPT:
         limit = None
         
         # Determine columns to select
-        if query_analysis["intent"] in ["COUNT", "AVERAGE", "SUM", "MAX", "MIN"]:
+        if query_analysis["intent"] in _AGGREGATE_INTENTS:
             # For aggregation queries
             if columns:
                 # Find an appropriate column to aggregate
                 agg_column = None
                 
                 # First try to find a numeric column if the intent requires one
-                if query_analysis["intent"] in ["AVERAGE", "SUM", "MAX", "MIN"]:
+                if query_analysis["intent"] in _NUMERIC_AGGREGATE_INTENTS:
                     for col in columns:
-                        if col["data_type"] in ["integer", "number", "float", "decimal"]:
+                        if col["data_type"] in _NUMERIC_TYPES:
                             agg_column = col
                             break
                 
@@ -419,80 +939,46 @@ class QueryGPT:
                     agg_column = columns[0]
                 
                 if agg_column:
-                    func_name = {
-                        "COUNT": "COUNT",
-                        "AVERAGE": "AVG",
-                        "SUM": "SUM",
-                        "MAX": "MAX",
-                        "MIN": "MIN"
-                    }[query_analysis["intent"]]
+                    func_name = _AGGREGATE_FUNCTIONS[query_analysis["intent"]]
                     
-                    select_columns.append({
-                        "type": "aggregation",
-                        "function": func_name,
-                        "table": agg_column["table"],
-                        "column": agg_column["column"],
-                        "alias": f"{func_name.lower()}_{agg_column['column']}"
-                    })
+                    select_columns.append(SelectCol(
+                        _AGG, agg_column["table"], agg_column["column"],
+                        func_name, f"{func_name.lower()}_{agg_column['column']}"
+                    ))
             else:
                 # If no columns identified, just count all rows
-                select_columns.append({
-                    "type": "aggregation",
-                    "function": "COUNT",
-                    "table": "",
-                    "column": "*",
-                    "alias": "count"
-                })
+                select_columns.append(SelectCol(_AGG, "", "*", "COUNT", "count"))
         else:
             # For regular SELECT queries
             if columns:
                 for col in columns:
-                    select_columns.append({
-                        "type": "column",
-                        "table": col["table"],
-                        "column": col["column"]
-                    })
+                    select_columns.append(SelectCol(_COL, col["table"], col["column"]))
             else:
                 # If no columns specified, select all
-                select_columns.append({
-                    "type": "all",
-                    "table": "",
-                    "column": "*"
-                })
+                select_columns.append(SelectCol(_ALL, "", "*"))
         
         # Determine GROUP BY
         if query_analysis["has_grouping"]:
             # For grouped queries, add columns that aren't aggregated to GROUP BY
+            aggregated = {sel_col.column for sel_col in select_columns if sel_col.kind == _AGG}
             for col in columns:
-                # Check if this column is in select and not aggregated
-                is_aggregated = False
-                for sel_col in select_columns:
-                    if sel_col.get("type") == "aggregation" and sel_col.get("column") == col["column"]:
-                        is_aggregated = True
-                        break
-                
-                if not is_aggregated:
-                    group_by.append({
-                        "table": col["table"],
-                        "column": col["column"]
-                    })
+                if col["column"] not in aggregated:
+                    group_by.append(GroupCol(col["table"], col["column"]))
         
         # Determine ORDER BY
         if query_analysis["has_ordering"]:
             # For ordered queries, use the aggregated column or a relevant column
             if select_columns:
                 # Prioritize aggregated columns for ordering
-                agg_cols = [col for col in select_columns if col.get("type") == "aggregation"]
+                agg_cols = [col for col in select_columns if col.kind == _AGG]
                 if agg_cols:
                     order_col = agg_cols[0]
                 else:
                     order_col = select_columns[0]
                 
-                order_by.append({
-                    "table": order_col.get("table", ""),
-                    "column": order_col.get("column", "*"),
-                    "direction": query_analysis["order_direction"]
-                })
+                order_by.append(OrderCol(
+                    order_col.table, order_col.column, query_analysis["order_direction"]
+                ))
         
         # Determine LIMIT
         if query_analysis["has_limit"] and query_analysis["limit_value"]:
@@ -500,7 +986,20 @@ class QueryGPT:
         
         # Create where conditions based on query text
         if query_analysis["has_conditions"]:
-            query_text = query_analysis["original_query"].lower()
+            query_text = ctx.lower
+            
+            # Find the first value for each (column, operator) in one sweep
+            values = self._condition_values(query_text, {col["column"].lower() for col in columns})
+            
+            # Date/time columns are compared against the current time, taken once per query
+            if "after" in query_text or "since" in query_text:
+                time_operator = ">"
+            elif "before" in query_text:
+                time_operator = "<"
+            else:
+                time_operator = None
+            if time_operator and any(col["data_type"] in _TEMPORAL_TYPES for col in columns):
+                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
             # Look for common condition patterns
             for col in columns:
@@ -508,439 +1007,558 @@ class QueryGPT:
                 table_name = col["table"]
                 
                 # Special handling for date/time conditions
-                if col["data_type"] in ["timestamp", "date", "datetime"]:
-                    if "after" in query_text or "since" in query_text:
-                        # Get current date/time for dynamic comparison
-                        from datetime import datetime
-                        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        where_conditions.append({
-                            "table": table_name,
-                            "column": col["column"],
-                            "operator": ">",
-                            "value": current_time
-                        })
-                    elif "before" in query_text:
-                        where_conditions.append({
-                            "table": table_name,
-                            "column": col["column"],
-                            "operator": "<",
-                            "value": current_time
-                        })
+                if time_operator and col["data_type"] in _TEMPORAL_TYPES:
+                    where_conditions.append(WhereCond(table_name, col["column"], time_operator, current_time))
                 
                 # Check for equality conditions
-                equality_patterns = [
-                    fr"{col_name}\s+is\s+(\w+)",
-                    fr"{col_name}\s+equals\s+(\w+)",
-                    fr"{col_name}\s+=\s+(\w+)",
-                    fr"{col_name}\s+after\s+(\d+)",
-                    fr"{col_name}\s+before\s+(\d+)",
-                    fr"{col_name}\s+greater than\s+(\d+)",
-                    fr"{col_name}\s+less than\s+(\d+)"
-                ]
-                
-                # Check for LIKE conditions
-                like_patterns = [
-                    fr"{col_name}\s+contains\s+(\w+)",
-                    fr"{col_name}\s+like\s+(\w+)",
-                    fr"{col_name}\s+matches\s+(\w+)",
-                    fr"{col_name}\s+with\s+(\w+)"
-                ]
-                
-                for pattern in equality_patterns:
-                    match = re.search(pattern, query_text)
-                    if match:
-                        where_conditions.append({
-                            "table": table_name,
-                            "column": col["column"],
-                            "operator": "=",
-                            "value": match.group(1)
-                        })
+                value = values.get((col_name, "="))
+                if value is not None:
+                    where_conditions.append(WhereCond(table_name, col["column"], "=", value))
                 
                 # Check for greater/less than conditions
-                gt_patterns = [
-                    fr"{col_name}\s+greater\s+than\s+(\d+)",
-                    fr"{col_name}\s+>\s+(\d+)",
-                    fr"{col_name}\s+more\s+than\s+(\d+)"
-                ]
-                
-                for pattern in gt_patterns:
-                    match = re.search(pattern, query_text)
-                    if match:
-                        where_conditions.append({
-                            "table": table_name,
-                            "column": col["column"],
-                            "operator": ">",
-                            "value": match.group(1)
-                        })
-                
-                lt_patterns = [
-                    fr"{col_name}\s+less\s+than\s+(\d+)",
-                    fr"{col_name}\s+<\s+(\d+)",
-                    fr"{col_name}\s+fewer\s+than\s+(\d+)"
-                ]
+                value = values.get((col_name, ">"))
+                if value is not None:
+                    where_conditions.append(WhereCond(table_name, col["column"], ">", value))
                 
-                for pattern in lt_patterns:
-                    match = re.search(pattern, query_text)
-                    if match:
-                        where_conditions.append({
-                            "table": table_name,
-                            "column": col["column"],
-                            "operator": "<",
-                            "value": match.group(1)
-                        })
+                value = values.get((col_name, "<"))
+                if value is not None:
+                    where_conditions.append(WhereCond(table_name, col["column"], "<", value))
                 
                 # Handle LIKE conditions
-                for pattern in like_patterns:
-                    match = re.search(pattern, query_text)
-                    if match:
-                        value = match.group(1)
-                        # Special handling for email patterns
-                        if col_name == "email" and ("gmail" in query_text or "yahoo" in query_text):
-                            value = f"%{value}%"
-                        where_conditions.append({
-                            "table": table_name,
-                            "column": col["column"],
-                            "operator": "LIKE",
-                            "value": value
-                        })
+                value = values.get((col_name, "LIKE"))
+                if value is not None:
+                    # Special handling for email patterns
+                    if col_name == "email" and ("gmail" in query_text or "yahoo" in query_text):
+                        value = f"%{value}%"
+                    where_conditions.append(WhereCond(table_name, col["column"], "LIKE", value))
         
         # Bundle all components
-        query_components = {
-            "select": select_columns,
-            "from": from_tables,
-            "where": where_conditions,
-            "group_by": group_by,
-            "order_by": order_by,
-            "limit": limit
-        }
+        query_components = QueryComponents(
+            select_columns, from_tables, where_conditions, group_by, order_by, limit
+        )
         
         return query_type, query_components
     
-    def _generate_sql(self, query_type: str, components: Dict[str, Any]) -> str:
+    def _condition_values(self, query_text: str, col_names: set) -> Dict[Tuple[str, str], str]:
+        """
+        Find condition values for the given columns in a single sweep over the query.
+        
+        The sweep regex over all column names is shared per column set; every
+        occurrence of a name, including ones inside longer words, is tried
+        against the combined condition tail pattern.
+        
+        Args:
+            query_text: Lowercased natural language query
+            col_names: Lowercased column names to look for
+            
+        Returns:
+            Dict mapping (column name, operator) to the first value found for it
+        """
+        if not col_names:
+            return {}
+        sweep = _condition_sweep(tuple(sorted(col_names)))
+        
+        values = {}
+        for match in sweep.finditer(query_text):
+            name = match.group(1)
+            tail_match = _CONDITION_TAIL_RE.match(query_text, match.start() + len(name))
+            if tail_match:
+                # The value is the group right inside the form that matched
+                value = tail_match.group(tail_match.lastindex + 1)
+                for operator in _CONDITION_OPERATORS[tail_match.lastgroup]:
+                    values.setdefault((name, operator), value)
+        return values
+    
+    def _join_clause(self, prev_table: str, curr_table: str) -> Optional[str]:
+        """
+        Get the JOIN clause adding curr_table to a query that already has prev_table.
+        
+        Clauses are derived from the metadata relationships on first use and
+        memoized per table pair until the metadata changes.
+        
+        Args:
+            prev_table: Table already in the query
+            curr_table: Table being joined
+            
+        Returns:
+            JOIN clause text, or None if the tables have no known relationship
+        """
+        key = (prev_table, curr_table)
+        try:
+            return self._join_clauses[key]
+        except KeyError:
+            pass
+        
+        relationships = self.metadata["relationships"]
+        relationship_key = f"{prev_table}_{curr_table}"
+        reverse_key = f"{curr_table}_{prev_table}"
+        if relationship_key in relationships:
+            rel = relationships[relationship_key]
+            left_table, right_table = prev_table, curr_table
+        elif reverse_key in relationships:
+            rel = relationships[reverse_key]
+            left_table, right_table = curr_table, prev_table
+        else:
+            rel = None
+        
+        join_clause = None
+        if rel is not None:
+            join_clause = (
+                f"\n    JOIN {curr_table} ON {left_table}.{rel['from_column']}"
+                f" = {right_table}.{rel['to_column']}"
+            )
+        self._join_clauses[key] = join_clause
+        return join_clause
+    
+    def _generate_sql(self, query_type: str, components: QueryComponents) -> str:
         """
         Generate the SQL query string from the components with improved
         handling of complex queries and better formatting.
         
         Args:
             query_type: The type of query (SELECT, etc.)
-            components: Dictionary of query components
+            components: The query components
             
         Returns:
             SQL query string
         """
-        query_parts = []
+        select_cols = components.select
+        from_tables = components.tables
+        where_conds = components.where
+        group_cols = components.group_by
+        order_cols = components.order_by
+        limit = components.limit
+        
+        # The clause layout only depends on which clauses are present, so the
+        # format template for each shape is built once and reused
+        shape = (bool(where_conds), bool(group_cols), bool(order_cols), limit is not None)
+        template = _SQL_TEMPLATES.get(shape)
+        if template is None:
+            template = _SQL_TEMPLATES[shape] = _build_sql_template(*shape)
         
         # SELECT clause with improved formatting
-        select_items = []
-        for col in components["select"]:
-            if col.get("type") == "all":
-                select_items.append("*")
-            elif col.get("type") == "aggregation":
-                table_prefix = f"{col['table']}." if col['table'] and col['column'] != '*' else ""
-                aggregation = f"{col['function']}({table_prefix}{col['column']})"
-                
-                if col.get("alias"):
-                    aggregation += f" AS {col['alias']}"
-                
-                select_items.append(aggregation)
+        select_parts = []
+        for col in select_cols:
+            kind = col.kind
+            if kind == _ALL:
+                select_parts.append("*")
+            elif kind == _AGG:
+                if col.table and col.column != "*":
+                    part = f"{col.function}({col.table}.{col.column})"
+                else:
+                    part = f"{col.function}({col.column})"
+                select_parts.append(f"{part} AS {col.alias}" if col.alias else part)
             else:
-                table_prefix = f"{col['table']}." if col['table'] else ""
-                select_items.append(f"{table_prefix}{col['column']}")
-        
-        query_parts.append(f"SELECT\n    {',\n    '.join(select_items)}")
+                select_parts.append(f"{col.table}.{col.column}" if col.table else col.column)
         
         # FROM clause with improved join handling
-        if len(components["from"]) == 1:
-            query_parts.append(f"FROM\n    {components['from'][0]}")
-        else:
-            from_clause = f"FROM\n    {components['from'][0]}"
-            
+        from_parts = [from_tables[0]]
+        if len(from_tables) > 1:
             # If we have table relationship metadata, use it
             if self.metadata and "relationships" in self.metadata:
-                relationships = self.metadata["relationships"]
-                
                 # Add joins for related tables
-                for i in range(1, len(components["from"])):
-                    curr_table = components["from"][i]
-                    join_found = False
+                for i in range(1, len(from_tables)):
+                    curr_table = from_tables[i]
                     
                     # Check all possible join directions
-                    for prev_table in components["from"][:i]:
-                        relationship_key = f"{prev_table}_{curr_table}"
-                        reverse_key = f"{curr_table}_{prev_table}"
-                        
-                        if relationship_key in relationships:
-                            rel = relationships[relationship_key]
-                            from_clause += f"\n    JOIN {curr_table} ON {prev_table}.{rel['from_column']} = {curr_table}.{rel['to_column']}"
-                            join_found = True
-                            break
-                        elif reverse_key in relationships:
-                            rel = relationships[reverse_key]
-                            from_clause += f"\n    JOIN {curr_table} ON {curr_table}.{rel['from_column']} = {prev_table}.{rel['to_column']}"
-                            join_found = True
+                    for prev_table in from_tables[:i]:
+                        join_clause = self._join_clause(prev_table, curr_table)
+                        if join_clause is not None:
+                            from_parts.append(join_clause)
                             break
-                    
-                    # If no specific join found, use LEFT JOIN by default
-                    if not join_found:
-                        from_clause += f"\n    LEFT JOIN {curr_table} ON 1=1"  # Placeholder for unknown join
+                    else:
+                        # If no specific join found, use LEFT JOIN by default
+                        from_parts.append(f"\n    LEFT JOIN {curr_table} ON 1=1")  # Placeholder for unknown join
             else:
                 # Without metadata, use CROSS JOINs
-                for i in range(1, len(components["from"])):
-                    from_clause += f"\n    CROSS JOIN {components['from'][i]}"
-            
-            query_parts.append(from_clause)
+                for curr_table in from_tables[1:]:
+                    from_parts.append(f"\n    CROSS JOIN {curr_table}")
         
         # WHERE clause with improved formatting
-        if components["where"]:
-            where_conditions = []
-            for cond in components["where"]:
-                table_prefix = f"{cond['table']}." if cond['table'] else ""
-                
-                # Enhanced value formatting
-                value = cond["value"]
-                if isinstance(value, str) and not value.isdigit():
-                    # Handle special cases for LIKE conditions
-                    if cond["operator"].upper() == "LIKE":
-                        value = f"'%{value}%'"
-                    else:
-                        value = f"'{value}'"
-                
-                where_conditions.append(f"{table_prefix}{cond['column']} {cond['operator']} {value}")
+        where_parts = []
+        for cond in where_conds:
+            target = f"{cond.table}.{cond.column}" if cond.table else cond.column
             
-            query_parts.append(f"WHERE\n    {' AND\n    '.join(where_conditions)}")
+            # Enhanced value formatting
+            value = cond.value
+            if isinstance(value, str) and not value.isdigit():
+                # Handle special cases for LIKE conditions
+                if cond.operator.upper() == "LIKE":
+                    value = f"'%{value}%'"
+                else:
+                    value = f"'{value}'"
+            where_parts.append(f"{target} {cond.operator} {value}")
         
         # GROUP BY clause with improved formatting
-        if components["group_by"]:
-            group_cols = []
-            for col in components["group_by"]:
-                table_prefix = f"{col['table']}." if col['table'] else ""
-                group_cols.append(f"{table_prefix}{col['column']}")
-            
-            query_parts.append(f"GROUP BY\n    {',\n    '.join(group_cols)}")
+        group_parts = [f"{col.table}.{col.column}" if col.table else col.column
+                       for col in group_cols]
         
         # ORDER BY clause with improved formatting
-        if components["order_by"]:
-            order_cols = []
-            for col in components["order_by"]:
-                table_prefix = f"{col['table']}." if col['table'] else ""
-                column_name = col['column']
-                if column_name == "*":
-                    # For ordering by *, use first non-aggregated column if available
-                    if components["select"] and components["select"][0]["column"] != "*":
-                        column_name = components["select"][0]["column"]
-                    else:
-                        column_name = "1"  # Default to first column
-                
-                order_cols.append(f"{table_prefix}{column_name} {col['direction']}")
-            
-            query_parts.append(f"ORDER BY\n    {',\n    '.join(order_cols)}")
-        
-        # LIMIT clause
-        if components["limit"] is not None:
-            query_parts.append(f"LIMIT {components['limit']}")
-        
-        # Combine with proper line breaks and indentation
-        return "\n".join(query_parts) + ";"
+        order_parts = []
+        # For ordering by *, use first non-aggregated column if available,
+        # else default to the first column
+        if select_cols and select_cols[0].column != "*":
+            star_column = select_cols[0].column
+        else:
+            star_column = "1"
+        for col in order_cols:
+            column_name = col.column
+            if column_name == "*":
+                column_name = star_column
+            if col.table:
+                column_name = f"{col.table}.{column_name}"
+            order_parts.append(f"{column_name} {col.direction}")
+        
+        return template.format(
+            select=",\n    ".join(select_parts),
+            tables="".join(from_parts),
+            where=" AND\n    ".join(where_parts),
+            group_by=",\n    ".join(group_parts),
+            order_by=",\n    ".join(order_parts),
+            limit=limit,
+        )
     
-    def _generate_explanation(self, query_type: str, components: Dict[str, Any]) -> str:
+    def _render(self, query_type: str, components: QueryComponents,
+                query_analysis: Dict[str, Any], original_query: str) -> Tuple[str, str, str]:
         """
-        Generate a human-readable explanation of the SQL query.
-        
-        Args:
-            query_type: The type of query
-            components: Dictionary of query components
-            
-        Returns:
-            Human-readable explanation string
-        """
-        if query_type == "SELECT":
-            # Start with what data is being retrieved
-            if components["select"][0].get("type") == "all":
-                explanation = f"This query retrieves all columns from the {', '.join(components['from'])} table(s)"
-            elif components["select"][0].get("type") == "aggregation":
-                agg_func = components["select"][0]["function"].lower()
-                if agg_func == "count" and components["select"][0]["column"] == "*":
-                    explanation = f"This query counts all rows in the {', '.join(components['from'])} table(s)"
-                else:
-                    column_name = components["select"][0]["column"]
-                    explanation = f"This query calculates the {agg_func} of {column_name} from the {', '.join(components['from'])} table(s)"
-            else:
-                columns = [col.get("column") for col in components["select"]]
-                explanation = f"This query retrieves {', '.join(columns)} from the {', '.join(components['from'])} table(s)"
-            
-            # Add filtering explanation if where conditions exist
-            if components["where"]:
-                conditions = []
-                for cond in components["where"]:
-                    operator_text = {
-                        "=": "equals",
-                        ">": "is greater than",
-                        "<": "is less than",
-                        ">=": "is greater than or equal to",
-                        "<=": "is less than or equal to",
-                        "!=": "is not equal to"
-                    }.get(cond["operator"], cond["operator"])
-                    
-                    conditions.append(f"{cond['column']} {operator_text} {cond['value']}")
-                
-                explanation += f" where {' and '.join(conditions)}"
-            
-            # Add grouping explanation
-            if components["group_by"]:
-                group_cols = [col["column"] for col in components["group_by"]]
-                explanation += f", grouped by {', '.join(group_cols)}"
-            
-            # Add ordering explanation
-            if components["order_by"]:
-                direction = "descending" if components["order_by"][0]["direction"] == "DESC" else "ascending"
-                explanation += f", ordered by {components['order_by'][0]['column']} in {direction} order"
-            
-            # Add limit explanation
-            if components["limit"] is not None:
-                explanation += f", limited to {components['limit']} results"
+        Generate the SQL query together with its explanation and reasoning.
         
-        return explanation + "."
-    
-    def _generate_reasoning(self, original_query: str, query_analysis: Dict[str, Any], 
-                          query_type: str, components: Dict[str, Any]) -> str:
-        """
-        Generate reasoning explaining why the SQL was constructed this way.
+        The column lists and wording shared by the explanation and the reasoning
+        are derived from the components once and used by both.
         
         Args:
-            original_query: Original natural language query
+            query_type: The type of query (SELECT, etc.)
+            components: The query components
             query_analysis: Query analysis dictionary
-            query_type: Type of query
-            components: Query components
+            original_query: Original natural language query
             
         Returns:
-            Reasoning explanation string
+            Tuple of (SQL query string, human-readable explanation, reasoning explanation)
         """
+        sql_query = self._generate_sql(query_type, components)
+        
+        # Fragments shared by the explanation and the reasoning
+        tables_str = ", ".join(components.tables)
+        first = components.select[0]
+        if first.kind == _COL:
+            columns_str = ", ".join(map(_column_of, components.select))
+        if components.group_by:
+            group_str = ", ".join(map(_column_of, components.group_by))
+        if components.order_by:
+            order_col = components.order_by[0]
+            direction = _DIRECTION_TEXT.get(order_col.direction, "ascending")
+        
+        explanation_parts = []
         reasoning_parts = []
         
         # Explain the initial query understanding
         reasoning_parts.append(f"I analyzed the question \"{original_query}\" to understand the user's intent.")
         
         # Explain table selection
-        if components["from"]:
-            reasoning_parts.append(f"I identified {', '.join(components['from'])} as the relevant table(s) based on the question context.")
+        if components.tables:
+            reasoning_parts.append(f"I identified {tables_str} as the relevant table(s) based on the question context.")
         
         # Explain query type selection
-        if query_analysis["intent"] in ["COUNT", "AVERAGE", "SUM", "MAX", "MIN"]:
+        if query_analysis["intent"] in _AGGREGATE_INTENTS:
             reasoning_parts.append(f"The question indicates a need for {query_analysis['intent'].lower()} aggregation based on keywords used.")
         
-        # Explain column selection
-        if components["select"][0].get("type") == "all":
+        # Explain what data is being retrieved
+        if first.kind == _ALL:
+            explanation_parts.append(f"This query retrieves all columns from the {tables_str} table(s)")
             reasoning_parts.append("I selected all columns (*) since the question doesn't specify which fields to retrieve.")
-        elif components["select"][0].get("type") == "aggregation":
-            agg_column = components["select"][0]["column"]
-            if agg_column == "*":
+        elif first.kind == _AGG:
+            agg_func = first.function.lower()
+            if agg_func == "count" and first.column == "*":
+                explanation_parts.append(f"This query counts all rows in the {tables_str} table(s)")
+            else:
+                explanation_parts.append(f"This query calculates the {agg_func} of {first.column} from the {tables_str} table(s)")
+            if first.column == "*":
                 reasoning_parts.append("I used COUNT(*) to count all rows since the question asks for a count of entries.")
             else:
-                reasoning_parts.append(f"I applied {components['select'][0]['function']} to the {agg_column} column based on the question's intent.")
+                reasoning_parts.append(f"I applied {first.function} to the {first.column} column based on the question's intent.")
         else:
-            columns = [col.get("column") for col in components["select"]]
-            reasoning_parts.append(f"I selected the specific columns {', '.join(columns)} which are relevant to the question.")
+            explanation_parts.append(f"This query retrieves {columns_str} from the {tables_str} table(s)")
+            reasoning_parts.append(f"I selected the specific columns {columns_str} which are relevant to the question.")
         
         # Explain conditions
-        if components["where"]:
-            reasoning_parts.append(f"I added {len(components['where'])} filter condition(s) to match the criteria in the question.")
+        if components.where:
+            conditions = [f"{cond.column} {_OPERATOR_TEXT.get(cond.operator, cond.operator)} {cond.value}"
+                          for cond in components.where]
+            explanation_parts.append(f" where {' and '.join(conditions)}")
+            reasoning_parts.append(f"I added {len(components.where)} filter condition(s) to match the criteria in the question.")
         
         # Explain grouping
-        if components["group_by"]:
-            group_cols = [col["column"] for col in components["group_by"]]
-            reasoning_parts.append(f"I grouped by {', '.join(group_cols)} since the question asks for results organized by these dimensions.")
+        if components.group_by:
+            explanation_parts.append(f", grouped by {group_str}")
+            reasoning_parts.append(f"I grouped by {group_str} since the question asks for results organized by these dimensions.")
         
         # Explain ordering
-        if components["order_by"]:
-            direction = "descending" if components["order_by"][0]["direction"] == "DESC" else "ascending"
-            reasoning_parts.append(f"I ordered results by {components['order_by'][0]['column']} in {direction} order as implied by the question.")
+        if components.order_by:
+            explanation_parts.append(f", ordered by {order_col.column} in {direction} order")
+            reasoning_parts.append(f"I ordered results by {order_col.column} in {direction} order as implied by the question.")
         
         # Explain limiting
-        if components["limit"] is not None:
-            reasoning_parts.append(f"I limited results to {components['limit']} rows based on the question's request for a specific number of results.")
+        if components.limit is not None:
+            explanation_parts.append(f", limited to {components.limit} results")
+            reasoning_parts.append(f"I limited results to {components.limit} rows based on the question's request for a specific number of results.")
+        
+        explanation_parts.append(".")
+        return sql_query, "".join(explanation_parts), " ".join(reasoning_parts) + _SAFETY_SUFFIX
+
+class SQLResult(dict):
+    """
+    SQL generated for a question by generate_sql, with its explanations.
+    
+    A dict with the keys "sql", "explanation" and "reasoning", as generate_sql
+    has always returned, so lookups, membership tests, dict() and JSON
+    serialization keep working; the values can also be read as attributes,
+    e.g. result.sql.
+    """
+    __slots__ = ()
+    
+    def __init__(self, sql: Optional[str], explanation: str, reasoning: str):
+        super().__init__(sql=sql, explanation=explanation, reasoning=reasoning)
+    
+    sql = property(itemgetter("sql"), doc="Generated SQL query, or None if none could be built")
+    explanation = property(itemgetter("explanation"), doc="Plain-language description of the query")
+    reasoning = property(itemgetter("reasoning"), doc="How the query was derived from the question")
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the result as a plain dict."""
+        return dict(self)
+
+
+# Agents reused by generate_sql, keyed by id() of the schema they were built for
+_AGENT_CACHE_SIZE = 8
+_agents: "OrderedDict[int, Tuple[Dict, tuple, QueryGPT]]" = OrderedDict()
+# Agents are not thread-safe, so calls sharing them are serialized
+_agents_lock = threading.Lock()
+
+
+def _schema_fingerprint(schema: Dict[str, List[Dict[str, Any]]]) -> tuple:
+    """
+    Summarize a schema's tables and columns, to detect schemas modified in place.
+    
+    Args:
+        schema: Dict mapping table names to lists of column information
         
-        # Add safety considerations
-        reasoning_parts.append("The query is read-only (SELECT) to ensure data safety and prevent any database modifications.")
-        reasoning_parts.append("Parameters should be properly escaped when executing this query to prevent SQL injection.")
+    Returns:
+        Hashable tuple of table names with their column names, types and descriptions
+    """
+    return tuple(
+        (table_name, tuple((col["name"], col.get("data_type"), col.get("description")) for col in columns))
+        for table_name, columns in schema.items()
+    )
+
+
+def _metadata_fingerprint(value: Any) -> Any:
+    """
+    Snapshot metadata contents as nested tuples, to detect metadata modified in place.
+    
+    Args:
+        value: Metadata mapping, or any value nested in it
         
-        return " ".join(reasoning_parts)
+    Returns:
+        Comparable copy of the value, with mappings and sequences turned into tuples
+    """
+    if isinstance(value, Mapping):
+        return tuple((key, _metadata_fingerprint(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(map(_metadata_fingerprint, value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(_metadata_fingerprint, value))
+    return value
 
 
-def generate_sql(user_question: str, schema: Dict = None, metadata: Dict = None) -> Dict:
+def _get_agent(schema: Optional[Dict[str, List[Dict[str, Any]]]]) -> QueryGPT:
+    """
+    Get an agent for a schema, reusing the one built by an earlier call for the same schema.
+    
+    Args:
+        schema: Database schema information
+        
+    Returns:
+        QueryGPT agent for the schema
+    """
+    if not isinstance(schema, dict):
+        return QueryGPT(schema)
+    
+    key = id(schema)
+    fingerprint = _schema_fingerprint(schema)
+    entry = _agents.get(key)
+    # The entry keeps its schema alive, so a matching id is always the same object
+    if entry is not None and entry[0] is schema and entry[1] == fingerprint:
+        _agents.move_to_end(key)
+        return entry[2]
+    
+    agent = QueryGPT(schema)
+    _agents[key] = (schema, fingerprint, agent)
+    _agents.move_to_end(key)
+    if len(_agents) > _AGENT_CACHE_SIZE:
+        _agents.popitem(last=False)
+    return agent
+
+
+def generate_sql(user_question: str, schema: Dict = None,
+                 metadata: Mapping[str, Any] = _EMPTY_METADATA) -> SQLResult:
     """
     Function to generate SQL from natural language questions.
     
+    Agents are reused across calls with the same schema object, so its index
+    and the result cache are built once. Each call still starts without
+    conversational context.
+    
     Args:
         user_question: The natural language question to convert to SQL
         schema: Optional database schema information
         metadata: Optional database metadata (relationships, etc.)
         
     Returns:
-        Dictionary containing the SQL query and explanations
+        SQLResult containing the SQL query and explanations
     """
-    agent = QueryGPT(schema)
+    return generate_sql_batch([user_question], schema, metadata)[0]
+
+
+def _clear_generate_cache():
+    """Drop the agents shared by generate_sql calls, along with their cached results."""
+    with _agents_lock:
+        _agents.clear()
+
+
+# Mirror the functools.lru_cache API for callers resetting generate_sql
+generate_sql.cache_clear = _clear_generate_cache
+
+
+def generate_sql_batch(questions: List[str], schema: Dict = None,
+                       metadata: Mapping[str, Any] = _EMPTY_METADATA) -> List[SQLResult]:
+    """
+    Function to generate SQL for several natural language questions at once.
+    
+    The agent lookup and metadata setup happen once for the whole batch. Each
+    question is answered independently, as if passed to generate_sql.
+    Concurrent calls from several threads are serialized, since they may
+    share an agent.
     
-    if metadata:
-        agent.set_metadata(metadata)
+    Args:
+        questions: The natural language questions to convert to SQL
+        schema: Optional database schema information
+        metadata: Optional database metadata (relationships, etc.)
         
-    result = agent.process_query(user_question)
+    Returns:
+        List of SQLResult containing the SQL query and explanations, one per question
+    """
+    # The default shared empty mapping is recognized by identity alone
+    if metadata is None:
+        metadata = _EMPTY_METADATA
     
+    results = []
+    with _agents_lock:
+        agent = _get_agent(schema)
+        # Compared by contents, so metadata changed in place since the last
+        # call does not keep serving joins built from its old contents
+        if _metadata_fingerprint(metadata) != agent._metadata_fingerprint:
+            agent.set_metadata(metadata)
+        
+        for user_question in questions:
+            agent.clear_context()
+            result = agent.process_query(user_question)
+            results.append(SQLResult(result["sql"], result["explanation"], result["reasoning"]))
+    return results
+
+def _build_sample_schema() -> Dict[str, List[Dict[str, Any]]]:
+    """Build the example schema for demonstration."""
     return {
-        "sql": result["sql"],
-        "explanation": result["explanation"],
-        "reasoning": result["reasoning"]
+        "users": [
+            {"name": "id", "data_type": "integer", "description": "User ID"},
+            {"name": "name", "data_type": "varchar", "description": "User's full name"},
+            {"name": "email", "data_type": "varchar", "description": "User's email address"},
+            {"name": "created_at", "data_type": "timestamp", "description": "When user was created"},
+            {"name": "role", "data_type": "varchar", "description": "User role"}
+        ],
+        "orders": [
+            {"name": "id", "data_type": "integer", "description": "Order ID"},
+            {"name": "user_id", "data_type": "integer", "description": "User who placed the order"},
+            {"name": "product_id", "data_type": "integer", "description": "Product ordered"},
+            {"name": "quantity", "data_type": "integer", "description": "Quantity ordered"},
+            {"name": "price", "data_type": "decimal", "description": "Price per unit"},
+            {"name": "order_date", "data_type": "timestamp", "description": "When order was placed"}
+        ],
+        "products": [
+            {"name": "id", "data_type": "integer", "description": "Product ID"},
+            {"name": "name", "data_type": "varchar", "description": "Product name"},
+            {"name": "category", "data_type": "varchar", "description": "Product category"},
+            {"name": "price", "data_type": "decimal", "description": "Product price"},
+            {"name": "stock", "data_type": "integer", "description": "Current stock level"}
+        ]
     }
 
-# Example schema for demonstration
-sample_schema = {
-    "users": [
-        {"name": "id", "data_type": "integer", "description": "User ID"},
-        {"name": "name", "data_type": "varchar", "description": "User's full name"},
-        {"name": "email", "data_type": "varchar", "description": "User's email address"},
-        {"name": "created_at", "data_type": "timestamp", "description": "When user was created"},
-        {"name": "role", "data_type": "varchar", "description": "User role"}
-    ],
-    "orders": [
-        {"name": "id", "data_type": "integer", "description": "Order ID"},
-        {"name": "user_id", "data_type": "integer", "description": "User who placed the order"},
-        {"name": "product_id", "data_type": "integer", "description": "Product ordered"},
-        {"name": "quantity", "data_type": "integer", "description": "Quantity ordered"},
-        {"name": "price", "data_type": "decimal", "description": "Price per unit"},
-        {"name": "order_date", "data_type": "timestamp", "description": "When order was placed"}
-    ],
-    "products": [
-        {"name": "id", "data_type": "integer", "description": "Product ID"},
-        {"name": "name", "data_type": "varchar", "description": "Product name"},
-        {"name": "category", "data_type": "varchar", "description": "Product category"},
-        {"name": "price", "data_type": "decimal", "description": "Product price"},
-        {"name": "stock", "data_type": "integer", "description": "Current stock level"}
-    ]
-}
 
-# Example metadata with relationships
-sample_metadata = {
-    "relationships": {
-        "users_orders": {
-            "from_column": "id",
-            "to_column": "user_id",
-            "relationship_type": "one_to_many"
-        },
-        "products_orders": {
-            "from_column": "id",
-            "to_column": "product_id",
-            "relationship_type": "one_to_many"
+def _build_sample_metadata() -> Dict[str, Any]:
+    """Build the example metadata with relationships."""
+    return {
+        "relationships": {
+            "users_orders": {
+                "from_column": "id",
+                "to_column": "user_id",
+                "relationship_type": "one_to_many"
+            },
+            "products_orders": {
+                "from_column": "id",
+                "to_column": "product_id",
+                "relationship_type": "one_to_many"
+            }
         }
     }
+
+
+# The sample_schema and sample_metadata examples are built on first access
+_LAZY_SAMPLES = {
+    "sample_schema": _build_sample_schema,
+    "sample_metadata": _build_sample_metadata,
 }
 
+
+def __getattr__(name: str):
+    """
+    Build a lazily created module attribute and keep it as a module global.
+    
+    Args:
+        name: Name of the attribute
+        
+    Returns:
+        The attribute value
+    """
+    build = _LAZY_SAMPLES.get(name)
+    if build is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_globals = globals()
+    if name not in module_globals:
+        module_globals[name] = build()
+    return module_globals[name]
+
+# Rows fetched per round trip when streaming query results
+_FETCH_SIZE = 1000
+
+
+def _iter_rows(cursor):
+    """Yield a cursor's rows in batches of _FETCH_SIZE, closing it once exhausted."""
+    try:
+        while True:
+            batch = cursor.fetchmany(_FETCH_SIZE)
+            if not batch:
+                break
+            yield from batch
+    finally:
+        cursor.close()
+
+
 def execute_query(conn, sql):
-    """Execute SQL query and return results"""
+    """Execute SQL query and return its column names with an iterator over the result rows"""
     try:
         cursor = conn.cursor()
         cursor.execute(sql)
         columns = [desc[0] for desc in cursor.description]
-        results = cursor.fetchall()
-        return columns, results
+        return columns, _iter_rows(cursor)
     except Exception as e:
         print(f"Error executing query: {e}")
         return None, None
@@ -961,8 +1579,8 @@ def interactive_cli():
             db_config = json.load(f)
 
     # Initialize with sample schema/metadata or real database
-    agent = QueryGPT(schema=sample_schema, db_config=db_config)
-    agent.set_metadata(sample_metadata)
+    agent = QueryGPT(schema=_build_sample_schema(), db_config=db_config)
+    agent.set_metadata(_build_sample_metadata())
 
     print("Natural Language to SQL Query Generator")
     print("Type your question or 'exit' to quit\n")
@@ -982,8 +1600,10 @@ def interactive_cli():
                 if columns:
                     print("\nResults:")
                     print("\t".join(columns))
+                    # Write rows directly, skipping print()'s argument handling per row
+                    write = sys.stdout.write
                     for row in results:
-                        print("\t".join(str(x) for x in row))
+                        write("\t".join(map(str, row)) + "\n")
             
             print("\n" + "-"*80 + "\n")
             
@@ -1,17 +1,193 @@
 import sqlite3
 import re
 import os
+import sys
 import datetime
-from tabulate import tabulate
+import time
+from collections import OrderedDict, deque
+
+from sql_table import CONNECTION_PRAGMAS, WRITE_PRAGMAS, fast_input
+
+# Compiled statements kept per connection; the generated SQL repeats per query
+# shape, so repeated questions skip SQLite's parse and plan step
+_STATEMENT_CACHE_SIZE = 256
+
+# SELECT results reused for repeated questions until a write or the TTL expires
+_RESULT_CACHE_SIZE = 128
+_RESULT_CACHE_TTL = 30.0
+# Larger results are shown once and then released instead of kept in memory
+_RESULT_CACHE_MAX_ROWS = 10000
+
+# Most recent queries kept for 'history', and how their times are shown
+_HISTORY_SIZE = 1000
+_HISTORY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Write buffer for CSV exports, so large results go out in few syscalls
+_EXPORT_BUFFER_SIZE = 1 << 20
+
+# Parsed natural-language requests kept per distinct token sequence, so a
+# repeated question skips tokenizing and matching against the schema
+_NL_CACHE_SIZE = 256
+
+# Words and operator runs of a user request
+_TOKEN_RE = re.compile(r'\b\w+\b|[><=!~]+')
+
+# Statements that can change the schema, after which the metadata is reloaded
+_DDL_RE = re.compile(r'^\s*(CREATE|ALTER|DROP)\b', re.IGNORECASE)
+
+# Transaction control, refused inside scripts since every script already
+# runs in a transaction of its own
+_TRANSACTION_RE = re.compile(r'^\s*(BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+# Keywords by intent, checked in this order
+_INTENT_KEYWORDS = {
+    'SELECT': frozenset(['select', 'get', 'show', 'find', 'search', 'display', 'list', 'query', 'view', 'retrieve', 'fetch']),
+    'INSERT': frozenset(['insert', 'add', 'create', 'new', 'register', 'save', 'store', 'put']),
+    'UPDATE': frozenset(['update', 'change', 'modify', 'edit', 'alter', 'replace', 'set']),
+    'DELETE': frozenset(['delete', 'remove', 'drop', 'clear', 'erase', 'eliminate'])
+}
+# Each keyword mapped to its intent and that intent's place in the order, so a
+# request naming several intents still resolves to the earliest one
+_KEYWORD_INTENTS = {word: (rank, intent)
+                    for rank, (intent, keywords) in enumerate(_INTENT_KEYWORDS.items())
+                    for word in keywords}
+_SCHEMA_WORDS = frozenset(['show', 'list', 'describe', 'schema'])
+_DESCRIBE_WORDS = frozenset(['schema', 'structure', 'describe'])
+_ALL_COLUMNS_WORDS = frozenset(['all', 'everything', '*'])
+
+# Operators recognized after a column name, and the (prefix, suffix) that
+# wraps the value of the ones translated to LIKE
+_CONDITION_OPERATORS = frozenset(['=', '>', '<', '>=', '<=', '!=', 'like', 'contains', 'starts', 'ends'])
+_LIKE_PATTERNS = {
+    'contains': ('%', '%'),
+    'starts': ('', '%'),
+    'ends': ('%', ''),
+    'like': ('%', '%')
+}
+
+# Readable wording of condition operators, for explanations
+_CONDITION_TEXT = {
+    'LIKE': 'contains [value]',
+    '=': 'equals [value]',
+    '>': 'is greater than [value]',
+    '<': 'is less than [value]',
+    '>=': 'is at least [value]',
+    '<=': 'is at most [value]',
+    '!=': 'is not [value]'
+}
+_CONDITION_TEXT_RE = re.compile(r' (LIKE|>=|<=|!=|=|>|<) \?')
+
+# SQLite's default cap on the terms of one compound SELECT
+_COMPOUND_SELECT_LIMIT = 500
+
+# Cell types of right-aligned columns, the cell types that need more than
+# str() to display, and the room kept around each header as tabulate does
+_NUMERIC_CELL_TYPES = frozenset([int, float, type(None)])
+_SPECIAL_CELL_TYPES = frozenset([float, type(None)])
+_HEADER_PADDING = 2
+
+# Icon shown before each explanation, and the risk levels that must be
+# confirmed by typing 'confirm'
+_RISK_ICONS = {
+    'none': '  ',
+    'low': '🟢',
+    'medium': '🟡',
+    'high': '🟠',
+    'critical': '🔴'
+}
+_HIGH_RISK_LEVELS = frozenset(['high', 'critical'])
+
+# Text shown by the 'help' command
+_HELP_TEXT = (
+    "\n📋 Help Information\n"
+    "------------------\n"
+    "1. Query Types:\n"
+    "   - Natural language: 'show all users where age > 25'\n"
+    "   - Direct SQL: 'SELECT * FROM users WHERE age > 25'\n"
+    "   - Schema exploration: 'show tables', 'describe users'\n"
+    "   - Operations: 'add new user', 'update user set name where id = 1'\n"
+    "\n2. Commands:\n"
+    "   - exit: Close the application\n"
+    "   - history: Show history of executed queries\n"
+    "   - help: Show this help information\n"
+    "\n3. Supported Operations:\n"
+    "   - SELECT: Retrieve data from tables\n"
+    "   - INSERT: Add new records\n"
+    "   - UPDATE: Modify existing records\n"
+    "   - DELETE: Remove records\n"
+    "   - SCHEMA: View database structure\n"
+)
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _split_statements(query):
+    # The statements of a direct SQL request, split where SQLite considers a
+    # statement complete, so semicolons in literals or trigger bodies stay put
+    statements = []
+    start = end = 0
+    while True:
+        end = query.find(';', end) + 1
+        if not end:
+            break
+        if sqlite3.complete_statement(query[start:end]):
+            statement = query[start:end].strip()
+            if statement != ';':
+                statements.append(statement)
+            start = end
+    rest = query[start:].strip()
+    if rest:
+        statements.append(rest)
+    return statements
+
+def _format_column(column, types):
+    # Text of one column's cells; columns without NULLs or floats, the usual
+    # case, convert in a single map(str) call
+    if types.isdisjoint(_SPECIAL_CELL_TYPES):
+        return list(map(str, column))
+    return ['' if v is None else format(v, 'g') if type(v) is float else str(v) for v in column]
+
+def _fast_tabulate(rows, headers, tablefmt='simple'):
+    # Plain-text table in tabulate's 'simple' or 'grid' layout, built column
+    # by column so the per-value work runs in map() rather than Python loops;
+    # numeric columns are right-aligned and floats use tabulate's 'g' format
+    headers = [str(h) for h in headers]
+    columns = list(zip(*rows)) or [()] * len(headers)
+    column_types = [set(map(type, column)) for column in columns]
+    cells = list(map(_format_column, columns, column_types))
+    widths = [max(len(h) + _HEADER_PADDING, max(map(len, column), default=0))
+              for h, column in zip(headers, cells)]
+    aligns = ['>' if types and types <= _NUMERIC_CELL_TYPES else '<' for types in column_types]
+    fields = [f'{{:{align}{width}}}' for align, width in zip(aligns, widths)]
+
+    if tablefmt == 'grid':
+        line = ('| ' + ' | '.join(fields) + ' |').format
+        rule = '+' + '+'.join('-' * (w + 2) for w in widths) + '+'
+        header_rule = rule.replace('-', '=')
+        lines = [rule, line(*headers), header_rule]
+        if rows:
+            lines.append(('\n' + rule + '\n').join(map(line, *cells)))
+            lines.append(rule)
+        return '\n'.join(lines)
+
+    line = '  '.join(fields).format
+    rule = '  '.join('-' * w for w in widths)
+    lines = [line(*headers).rstrip(), rule]
+    lines.extend(map(str.rstrip, map(line, *cells)))
+    return '\n'.join(lines)
 
 class RealTimeDBManager:
-    def _init_(self, db_path=None):
+    def __init__(self, db_path=None, pretty=False):
         self.db_path = db_path
+        self.pretty = pretty
         self.conn = None
         self.cursor = None
         self.tables = {}
-        self.history = []
+        self._table_aliases = {}
+        self.history = deque(maxlen=_HISTORY_SIZE)
         self.last_query_time = 0
+        self._result_cache = OrderedDict()
+        self._nl_cache = OrderedDict()
         
     def connect(self, db_path=None):
         if db_path:
@@ -30,13 +206,25 @@ class RealTimeDBManager:
                 return False
                 
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # Autocommit mode: writes open their own BEGIN IMMEDIATE transactions
+            self.conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                        cached_statements=_STATEMENT_CACHE_SIZE)
             self.cursor = self.conn.cursor()
+            # Write-ahead logging only applies to file databases
+            pragmas = CONNECTION_PRAGMAS if self.db_path == ':memory:' else CONNECTION_PRAGMAS + WRITE_PRAGMAS
+            for pragma in pragmas:
+                self.cursor.execute(f"PRAGMA {pragma}")
+            self._result_cache.clear()
             self.refresh_metadata()
             print(f"✓ Connected to database: {self.db_path}")
             print(f"  Available tables: {', '.join(self.tables.keys()) if self.tables else 'None'}")
             return True
         except sqlite3.Error as e:
+            # Don't keep a handle to a file that opened but failed to set up
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+                self.cursor = None
             print(f"✗ Database connection error: {e}")
             return False
             
@@ -47,25 +235,44 @@ class RealTimeDBManager:
             self.conn = None
             self.cursor = None
             self.tables = {}
+            self._index_tables()
+            self._result_cache.clear()
             
     def refresh_metadata(self):
         if not self.conn:
             return {}
             
-        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        self.tables = {table[0]: self.get_columns_with_types(table[0]) for table in self.cursor.fetchall() if not table[0].startswith('sqlite')}
+        # Load the columns of every table in one query instead of one PRAGMA per table
+        self.cursor.execute(
+            "SELECT m.name, p.name, p.type FROM sqlite_master AS m "
+            "JOIN pragma_table_info(m.name) AS p "
+            "WHERE m.type = 'table' AND substr(m.name, 1, 6) != 'sqlite' "
+            "ORDER BY m.rowid, p.cid;"
+        )
+        tables = {}
+        for table, column, col_type in self.cursor.fetchall():
+            tables.setdefault(table, {})[column] = col_type
+        self.tables = tables
+        self._index_tables()
         return self.tables
-        
-    def _get_columns_with_types(self, table):
-        self.cursor.execute(f"PRAGMA table_info({table})")
-        return {col[1]: col[2] for col in self.cursor.fetchall()}
+    
+    def _index_tables(self):
+        # Map singular and plural forms of the table names back to the tables;
+        # a form that drops a trailing 's' wins over one that adds it
+        aliases = {}
+        for table in self.tables:
+            if table.endswith('s'):
+                aliases[table[:-1]] = table
+        for table in self.tables:
+            aliases[table + 's'] = table
+        self._table_aliases = aliases
+        # Parses depend on the table names, so they are redone after a reload
+        self._nl_cache.clear()
 
     def parse_user_input(self, user_input):
         original_input = user_input
         
-        words = re.findall(r'\b\w+\b|[><=!~]+', user_input.lower())
-        
-        # Check if it's a direct SQL query
+        # Check if it's a direct SQL query, before tokenizing it as natural language
         if user_input.strip().upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'ALTER', 'DROP')):
             return {
                 'type': 'direct_sql',
@@ -73,7 +280,22 @@ class RealTimeDBManager:
                 'original': original_input
             }
             
-        # Process as natural language
+        # Process as natural language; requests that differ only in case,
+        # spacing or punctuation share one cached parse
+        words = _TOKEN_RE.findall(user_input.lower())
+        key = tuple(words)
+        cached = self._nl_cache.get(key)
+        if cached is not None:
+            self._nl_cache.move_to_end(key)
+            return dict(cached, original=original_input)
+        
+        parsed = self._parse_words(words)
+        self._nl_cache[key] = parsed
+        if len(self._nl_cache) > _NL_CACHE_SIZE:
+            self._nl_cache.popitem(last=False)
+        return dict(parsed, original=original_input)
+
+    def _parse_words(self, words):
         intent = self._detect_intent(words)
         tables = self._extract_tables(words)
         
@@ -89,45 +311,35 @@ class RealTimeDBManager:
                 'primary_table': primary_table,
                 'columns': columns,
                 'conditions': conditions,
-                'values': values,
-                'original': original_input
+                'values': values
             }
         else:
             # Check for schema-related commands
-            if any(word in words for word in ['show', 'list', 'describe', 'schema']):
-                if 'tables' in words:
+            word_set = set(words)
+            if not word_set.isdisjoint(_SCHEMA_WORDS):
+                if 'tables' in word_set:
                     return {
                         'type': 'schema_query',
-                        'command': 'list_tables',
-                        'original': original_input
+                        'command': 'list_tables'
                     }
-                elif any(word in words for word in ['schema', 'structure', 'describe']):
+                elif not word_set.isdisjoint(_DESCRIBE_WORDS):
                     # Find table name
                     for word in words:
                         if word in self.tables:
                             return {
                                 'type': 'schema_query',
                                 'command': 'describe_table',
-                                'table': word,
-                                'original': original_input
+                                'table': word
                             }
             
             return {
-                'type': 'unknown',
-                'original': original_input
+                'type': 'unknown'
             }
 
     def _detect_intent(self, words):
-        intent_keywords = {
-            'SELECT': ['select', 'get', 'show', 'find', 'search', 'display', 'list', 'query', 'view', 'retrieve', 'fetch'],
-            'INSERT': ['insert', 'add', 'create', 'new', 'register', 'save', 'store', 'put'],
-            'UPDATE': ['update', 'change', 'modify', 'edit', 'alter', 'replace', 'set'],
-            'DELETE': ['delete', 'remove', 'drop', 'clear', 'erase', 'eliminate']
-        }
-        
-        for intent, keywords in intent_keywords.items():
-            if any(word in words for word in keywords):
-                return intent
+        hits = [_KEYWORD_INTENTS[word] for word in words if word in _KEYWORD_INTENTS]
+        if hits:
+            return min(hits)[1]
         
         # Default to SELECT if we found tables but no intent
         for word in words:
@@ -146,13 +358,8 @@ class RealTimeDBManager:
                 
         # If no tables found, try plurals/singulars
         if not tables:
-            for word in words:
-                # Check for plural forms
-                if word.endswith('s') and word[:-1] in self.tables:
-                    tables.append(word[:-1])
-                # Check for singular forms
-                elif word + 's' in self.tables:
-                    tables.append(word + 's')
+            aliases = self._table_aliases
+            tables = [aliases[word] for word in words if word in aliases]
                     
         return tables
 
@@ -160,13 +367,13 @@ class RealTimeDBManager:
         if not table or table not in self.tables:
             return []
             
-        table_cols = list(self.tables[table].keys())
+        table_cols = self.tables[table]
         
         # Extract exact column matches
         columns = [word for word in words if word in table_cols]
         
         # Handle "all" keywords
-        if any(word in words for word in ['all', 'everything']) or '*' in words or not columns:
+        if not columns or not _ALL_COLUMNS_WORDS.isdisjoint(words):
             return ['*']
             
         return columns
@@ -175,37 +382,25 @@ class RealTimeDBManager:
         if not table or table not in self.tables:
             return [], []
             
-        table_cols = list(self.tables[table].keys())
+        table_cols = self.tables[table]
         conditions = []
         values = []
-        operators = ['=', '>', '<', '>=', '<=', '!=', 'like', 'contains', 'starts', 'ends']
         
-        i = 0
-        while i < len(words) - 2:
-            if words[i] in table_cols:
-                op = words[i + 1]
-                if op in operators:
-                    # Handle special operators
-                    if op == 'contains':
-                        conditions.append(f"{words[i]} LIKE ?")
-                        values.append(f"%{words[i + 2]}%")
-                    elif op == 'starts':
-                        conditions.append(f"{words[i]} LIKE ?")
-                        values.append(f"{words[i + 2]}%")
-                    elif op == 'ends':
-                        conditions.append(f"{words[i]} LIKE ?")
-                        values.append(f"%{words[i + 2]}")
-                    elif op == 'like':
-                        conditions.append(f"{words[i]} LIKE ?")
-                        values.append(f"%{words[i + 2]}%")
-                    else:
-                        conditions.append(f"{words[i]} {op} ?")
-                        values.append(words[i + 2])
-                    i += 3
+        # Slide over (column, operator, value) word triples
+        windows = zip(words, words[1:], words[2:])
+        for column, op, value in windows:
+            if column in table_cols and op in _CONDITION_OPERATORS:
+                # Handle special operators
+                pattern = _LIKE_PATTERNS.get(op)
+                if pattern:
+                    conditions.append(f"{column} LIKE ?")
+                    values.append(pattern[0] + value + pattern[1])
                 else:
-                    i += 1
-            else:
-                i += 1
+                    conditions.append(f"{column} {op} ?")
+                    values.append(value)
+                # The operator and value are not column candidates themselves
+                next(windows, None)
+                next(windows, None)
                 
         return conditions, values
 
@@ -214,14 +409,34 @@ class RealTimeDBManager:
             # Explain direct SQL
             query = parsed_query['query'].strip()
             first_word = query.split()[0].upper()
+            statements = _split_statements(query)
             
-            explanation = {
-                'action': first_word,
-                'explanation': f"Executing raw SQL {first_word} statement",
-                'details': "This will be executed exactly as written without any interpretation.",
-                'risk_level': 'medium' if first_word in ['UPDATE', 'DELETE', 'DROP', 'ALTER'] else 'low',
-                'query': query
-            }
+            if len(statements) > 1 and any(_TRANSACTION_RE.match(st) for st in statements):
+                explanation = {
+                    'action': 'Unknown',
+                    'explanation': "Cannot run this SQL script",
+                    'details': "Scripts cannot contain BEGIN, COMMIT, ROLLBACK, SAVEPOINT or RELEASE; each script already runs in a transaction of its own.",
+                    'risk_level': 'none'
+                }
+            elif len(statements) > 1:
+                # Any statement of a script may be destructive, so scripts
+                # always need the explicit confirmation
+                explanation = {
+                    'action': first_word,
+                    'explanation': f"Executing raw SQL script of {len(statements)} statements",
+                    'details': "Statements: " + ", ".join(st.split()[0].upper() for st in statements),
+                    'risk_level': 'high',
+                    'query': query,
+                    'statements': statements
+                }
+            else:
+                explanation = {
+                    'action': first_word,
+                    'explanation': f"Executing raw SQL {first_word} statement",
+                    'details': "This will be executed exactly as written without any interpretation.",
+                    'risk_level': 'medium' if first_word in ['UPDATE', 'DELETE', 'DROP', 'ALTER'] else 'low',
+                    'query': query
+                }
             
         elif parsed_query['type'] == 'nl_query':
             # Explain natural language query
@@ -350,19 +565,11 @@ class RealTimeDBManager:
         return explanation
     
     def _conditions_to_text(self, conditions):
-        readable_conditions = []
-        for cond in conditions:
-            # Replace SQL operators with readable text
-            readable = cond.replace(' LIKE ?', ' contains [value]')
-            readable = readable.replace(' = ?', ' equals [value]')
-            readable = readable.replace(' > ?', ' is greater than [value]')
-            readable = readable.replace(' < ?', ' is less than [value]')
-            readable = readable.replace(' >= ?', ' is at least [value]')
-            readable = readable.replace(' <= ?', ' is at most [value]')
-            readable = readable.replace(' != ?', ' is not [value]')
-            readable_conditions.append(readable)
-            
-        return ', '.join(readable_conditions)
+        # Replace SQL operators with readable text, in one pass per condition
+        return ', '.join(
+            _CONDITION_TEXT_RE.sub(lambda match: ' ' + _CONDITION_TEXT[match.group(1)], cond)
+            for cond in conditions
+        )
 
     def execute_analyzed_query(self, analysis):
         if not self.conn:
@@ -389,21 +596,28 @@ class RealTimeDBManager:
             
             try:
                 start_time = datetime.datetime.now()
-                self.cursor.execute(query, params)
                 
-                # Handle results based on query type
-                if query.strip().upper().startswith('SELECT'):
-                    rows = self.cursor.fetchall()
-                    headers = [desc[0] for desc in self.cursor.description]
+                # Handle results based on query type; scripts first, since one
+                # may start with a SELECT
+                if 'statements' in analysis:
+                    # Several statements run as one script in one transaction
+                    affected = self._write(query, params, script=True)
+                    print(f"✓ {action} script successful: {affected} rows affected")
+                    self.refresh_metadata()  # Any statement may have changed the schema
+                elif query.strip().upper().startswith('SELECT'):
+                    rows, headers, affected, cached = self._select(query, params)
                     
                     if rows:
                         print(f"\n✓ Query returned {len(rows)} results:")
-                        print(tabulate(rows, headers=headers, tablefmt='grid'))
+                        print(self._format_results(rows, headers))
                         
-                        # Show query stats
-                        end_time = datetime.datetime.now()
-                        duration = (end_time - start_time).total_seconds()
-                        print(f"  Query executed in {duration:.3f} seconds")
+                        # Show query stats; a cached result was not executed again
+                        if cached:
+                            print("  Served from the result cache")
+                        else:
+                            end_time = datetime.datetime.now()
+                            duration = (end_time - start_time).total_seconds()
+                            print(f"  Query executed in {duration:.3f} seconds")
                         
                         # Offer to export results
                         export = input("Export results to CSV? (y/n): ").lower()
@@ -412,13 +626,13 @@ class RealTimeDBManager:
                     else:
                         print("✗ No records found matching your query")
                 else:
-                    self.conn.commit()
-                    affected = self.cursor.rowcount
+                    affected = self._write(query, params)
                     print(f"✓ {action} operation successful: {affected} rows affected")
+                    if _DDL_RE.match(query):
+                        self.refresh_metadata()  # Update metadata after schema changes
                     
                 # Log the query to history
-                self._log_query(query, params, affected=self.cursor.rowcount)
-                self.refresh_metadata()  # Update metadata after changes
+                self._log_query(query, params, affected=affected)
                 return True
                 
             except sqlite3.Error as e:
@@ -428,30 +642,41 @@ class RealTimeDBManager:
         elif 'needs_input' in analysis:
             # Handle queries needing user input (INSERT, UPDATE)
             if action == 'INSERT':
-                # Collect values for all columns
-                values = []
-                for col in analysis['needs_input']:
-                    col_type = self.tables[analysis['explanation'].split("'")[1]][col]
-                    val = input(f"Enter value for '{col}' ({col_type}): ").strip()
+                table = analysis['explanation'].split("'")[1]
+                columns = analysis['needs_input']
+                
+                # Collect values for all columns, for one or more records
+                rows = []
+                while True:
+                    values = []
+                    for col in columns:
+                        col_type = self.tables[table][col]
+                        val = input(f"Enter value for '{col}' ({col_type}): ").strip()
+                        
+                        # Handle empty inputs for NULLs
+                        if not val:
+                            values.append(None)
+                        else:
+                            values.append(val)
+                    rows.append(values)
                     
-                    # Handle empty inputs for NULLs
-                    if not val:
-                        values.append(None)
-                    else:
-                        values.append(val)
+                    if input("Add another record? (y/n): ").lower() != 'y':
+                        break
                 
                 # Build and execute the INSERT query
-                table = analysis['explanation'].split("'")[1]
-                columns = analysis['needs_input']
                 placeholders = ', '.join(['?' for _ in columns])
-                query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+                query = f"INSERT INTO {_quote_identifier(table)} ({', '.join(map(_quote_identifier, columns))}) VALUES ({placeholders})"
                 
                 try:
-                    self.cursor.execute(query, values)
-                    self.conn.commit()
-                    print(f"✓ Record inserted successfully with ID: {self.cursor.lastrowid}")
-                    self._log_query(query, values, affected=1)
-                    self.refresh_metadata()
+                    if len(rows) == 1:
+                        self._write(query, values)
+                        print(f"✓ Record inserted successfully with ID: {self.cursor.lastrowid}")
+                        self._log_query(query, values, affected=1)
+                    else:
+                        # One prepared statement and a single commit for the whole batch
+                        self._write(query, rows, many=True)
+                        print(f"✓ {len(rows)} records inserted successfully")
+                        self._log_query(query, rows, affected=len(rows))
                     return True
                 except sqlite3.Error as e:
                     print(f"✗ Insert error: {e}")
@@ -475,46 +700,103 @@ class RealTimeDBManager:
                 all_params = tuple(update_values) + tuple(analysis['condition_params'])
                 
                 try:
-                    self.cursor.execute(query, all_params)
-                    self.conn.commit()
-                    affected = self.cursor.rowcount
+                    affected = self._write(query, all_params)
                     print(f"✓ Records updated successfully: {affected} rows affected")
                     self._log_query(query, all_params, affected=affected)
-                    self.refresh_metadata()
                     return True
                 except sqlite3.Error as e:
                     print(f"✗ Update error: {e}")
                     return False
         
         return False
+    
+    def _write(self, query, params, many=False, script=False):
+        # Take the write lock up front instead of upgrading a read lock
+        # mid-statement, and undo the whole statement or batch on failure
+        try:
+            if script:
+                # One call into SQLite for the whole script; its row count is
+                # the number of changes it made
+                changes = self.conn.total_changes
+                self.cursor.executescript(f"BEGIN IMMEDIATE;\n{query}\n;\nCOMMIT;")
+                self._result_cache.clear()
+                return self.conn.total_changes - changes
+            self.cursor.execute("BEGIN IMMEDIATE")
+            if many:
+                self.cursor.executemany(query, params)
+            else:
+                self.cursor.execute(query, params)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self._result_cache.clear()
+        return self.cursor.rowcount
         
+    def _select(self, query, params):
+        # Serve repeated SELECTs from the result cache while it is fresh
+        key = (query, tuple(params))
+        cached = self._result_cache.get(key)
+        if cached and cached[2] > time.monotonic():
+            self._result_cache.move_to_end(key)
+            return cached[0], cached[1], -1, True
+        
+        self.cursor.execute(query, params)
+        rows = self.cursor.fetchall()
+        headers = [desc[0] for desc in self.cursor.description]
+        
+        if len(rows) > _RESULT_CACHE_MAX_ROWS:
+            self._result_cache.pop(key, None)
+        else:
+            self._result_cache[key] = (rows, headers, time.monotonic() + _RESULT_CACHE_TTL)
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > _RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+        return rows, headers, self.cursor.rowcount, False
+        
+    def _format_results(self, rows, headers):
+        if self.pretty:
+            try:
+                from tabulate import tabulate
+                return tabulate(rows, headers=headers, tablefmt='grid')
+            except ImportError:
+                pass
+        return _fast_tabulate(rows, headers, tablefmt='grid')
+
     def _display_all_tables_info(self):
         if not self.tables:
             print("No tables found in database")
             return
             
+        # Get primary and foreign key info of all tables, one query each
+        pk_cols = {}
+        self.cursor.execute(
+            "SELECT m.name, p.name FROM sqlite_master AS m "
+            "JOIN pragma_table_info(m.name) AS p "
+            "WHERE m.type = 'table' AND p.pk > 0 ORDER BY m.rowid, p.cid;"
+        )
+        for table, column in self.cursor.fetchall():
+            pk_cols.setdefault(table, []).append(column)
+        
+        fk_cols = {}
+        self.cursor.execute(
+            'SELECT m.name, f."from", f."table", f."to" FROM sqlite_master AS m '
+            "JOIN pragma_foreign_key_list(m.name) AS f "
+            "WHERE m.type = 'table';"
+        )
+        for table, from_col, ref_table, to_col in self.cursor.fetchall():
+            fk_cols.setdefault(table, []).append(f"{from_col} -> {ref_table}.{to_col}")
+        
+        row_counts = self._count_rows(list(self.tables))
+        
         tables_info = []
         for table, columns in self.tables.items():
-            # Get row count
-            self.cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            row_count = self.cursor.fetchone()[0]
-            
-            # Get primary key info
-            self.cursor.execute(f"PRAGMA table_info({table})")
-            table_info = self.cursor.fetchall()
-            pk_cols = [col[1] for col in table_info if col[5] > 0]
-            
-            # Get foreign key info
-            self.cursor.execute(f"PRAGMA foreign_key_list({table})")
-            fk_info = self.cursor.fetchall()
-            fk_cols = [f"{col[3]} -> {col[2]}.{col[4]}" for col in fk_info]
-            
             tables_info.append({
                 'name': table,
                 'columns': columns,
-                'rows': row_count,
-                'primary_keys': pk_cols,
-                'foreign_keys': fk_cols
+                'rows': row_counts[table],
+                'primary_keys': pk_cols.get(table, []),
+                'foreign_keys': fk_cols.get(table, [])
             })
         
         print(f"\n📊 Database: {self.db_path}")
@@ -536,42 +818,65 @@ class RealTimeDBManager:
                 col_data.append([col, type_name, pk, fk])
                 
             print("\n  Column Structure:")
-            print(tabulate(col_data, headers=["Column", "Type", "PK", "FK"], tablefmt="simple"))
+            print(_fast_tabulate(col_data, headers=["Column", "Type", "PK", "FK"], tablefmt="simple"))
             
             # Show sample data if available
             if info['rows'] > 0:
                 try:
-                    self.cursor.execute(f"SELECT * FROM {info['name']} LIMIT 3")
+                    self.cursor.execute(f"SELECT * FROM {_quote_identifier(info['name'])} LIMIT 3")
                     rows = self.cursor.fetchall()
                     if rows:
                         headers = [desc[0] for desc in self.cursor.description]
                         print("\n  Sample Data:")
-                        print(tabulate(rows, headers=headers, tablefmt="simple"))
+                        print(_fast_tabulate(rows, headers=headers, tablefmt="simple"))
                 except sqlite3.Error:
                     pass
             
             print("\n" + "-" * 50)
     
+    def _count_rows(self, tables):
+        # Count the rows of all tables with one UNION ALL query per batch of tables
+        row_counts = {}
+        for start in range(0, len(tables), _COMPOUND_SELECT_LIMIT):
+            batch = tables[start:start + _COMPOUND_SELECT_LIMIT]
+            self.cursor.execute(" UNION ALL ".join(
+                f"SELECT {i}, COUNT(*) FROM {_quote_identifier(table)}"
+                for i, table in enumerate(batch, start)
+            ))
+            for i, count in self.cursor.fetchall():
+                row_counts[tables[i]] = count
+        return row_counts
+    
     def _display_table_info(self, table):
         if table not in self.tables:
             print(f"Table '{table}' not found in database")
             return
             
-        # Get table info
-        self.cursor.execute(f"PRAGMA table_info({table})")
-        columns_info = self.cursor.fetchall()
-        
-        # Get row count
-        self.cursor.execute(f"SELECT COUNT(*) FROM {table}")
-        row_count = self.cursor.fetchone()[0]
-        
-        # Get foreign key info
-        self.cursor.execute(f"PRAGMA foreign_key_list({table})")
-        fk_info = self.cursor.fetchall()
-        
-        # Get index info
-        self.cursor.execute(f"PRAGMA index_list({table})")
-        index_list = self.cursor.fetchall()
+        # Get row count, column, foreign key and index info in one query,
+        # each row tagged with the kind of info it carries
+        self.cursor.execute(
+            f"SELECT 'count', COUNT(*), NULL, NULL, NULL, NULL, NULL FROM {_quote_identifier(table)} "
+            "UNION ALL SELECT 'col', cid, name, type, \"notnull\", dflt_value, pk FROM pragma_table_info(?1) "
+            "UNION ALL SELECT 'fk', id, \"from\", \"table\", \"to\", NULL, NULL FROM pragma_foreign_key_list(?1) "
+            "UNION ALL SELECT 'idx', l.seq, l.name, l.\"unique\", i.name, NULL, NULL "
+            "FROM pragma_index_list(?1) AS l JOIN pragma_index_info(l.name) AS i",
+            (table,)
+        )
+        row_count = 0
+        columns_info = []
+        fk_info = []
+        index_info = {}
+        for kind, *info in self.cursor.fetchall():
+            if kind == 'count':
+                row_count = info[0]
+            elif kind == 'col':
+                columns_info.append(info[:6])
+            elif kind == 'fk':
+                fk_info.append(info[1:4])
+            else:
+                # One row per indexed column; expression columns have no name
+                name, unique, column = info[1:4]
+                index_info.setdefault(name, (unique, []))[1].append(column if column is not None else "<expression>")
         
         print(f"\n📋 Table: {table}")
         print(f"  Rows: {row_count}")
@@ -589,45 +894,40 @@ class RealTimeDBManager:
             ])
             
         print("\n  Column Structure:")
-        print(tabulate(col_data, headers=["Column", "Type", "PK", "Not NULL", "Default"], tablefmt="simple"))
+        print(_fast_tabulate(col_data, headers=["Column", "Type", "PK", "Not NULL", "Default"], tablefmt="simple"))
         
         # Display foreign key information
         if fk_info:
             fk_data = []
-            for fk in fk_info:
+            for from_col, ref_table, to_col in fk_info:
                 fk_data.append([
-                    fk[3],  # from column
-                    f"{fk[2]}.{fk[4]}"  # to table.column
+                    from_col,
+                    f"{ref_table}.{to_col}"
                 ])
             print("\n  Foreign Keys:")
-            print(tabulate(fk_data, headers=["Column", "References"], tablefmt="simple"))
+            print(_fast_tabulate(fk_data, headers=["Column", "References"], tablefmt="simple"))
         
         # Display index information
-        if index_list:
+        if index_info:
             index_data = []
-            for idx in index_list:
-                # Get columns in this index
-                self.cursor.execute(f"PRAGMA index_info({idx[1]})")
-                idx_cols = self.cursor.fetchall()
-                col_names = [columns_info[col[2]][1] for col in idx_cols]
-                
+            for name, (unique, col_names) in index_info.items():
                 index_data.append([
-                    idx[1],  # index name
-                    ", ".join(col_names),  # columns
-                    "✓" if idx[2] else "",  # unique
+                    name,
+                    ", ".join(col_names),
+                    "✓" if unique else "",
                 ])
             print("\n  Indexes:")
-            print(tabulate(index_data, headers=["Name", "Columns", "Unique"], tablefmt="simple"))
+            print(_fast_tabulate(index_data, headers=["Name", "Columns", "Unique"], tablefmt="simple"))
         
         # Show sample data if available
         if row_count > 0:
             try:
-                self.cursor.execute(f"SELECT * FROM {table} LIMIT 5")
+                self.cursor.execute(f"SELECT * FROM {_quote_identifier(table)} LIMIT 5")
                 rows = self.cursor.fetchall()
                 if rows:
                     headers = [desc[0] for desc in self.cursor.description]
                     print("\n  Sample Data:")
-                    print(tabulate(rows, headers=headers, tablefmt="simple"))
+                    print(_fast_tabulate(rows, headers=headers, tablefmt="simple"))
             except sqlite3.Error as e:
                 print(f"  Error fetching sample data: {e}")
                 
@@ -638,7 +938,7 @@ class RealTimeDBManager:
         filename = f"query_results_{timestamp}.csv"
         
         try:
-            with open(filename, 'w', newline='') as f:
+            with open(filename, 'w', newline='', buffering=_EXPORT_BUFFER_SIZE) as f:
                 writer = csv.writer(f)
                 writer.writerow(headers)
                 writer.writerows(rows)
@@ -651,7 +951,7 @@ class RealTimeDBManager:
     def _log_query(self, query, params, affected=0):
         timestamp = datetime.datetime.now()
         self.history.append({
-            'timestamp': timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            'timestamp': timestamp,
             'query': query,
             'params': params,
             'affected': affected
@@ -665,7 +965,7 @@ class RealTimeDBManager:
             
         print("\n📜 Query History:")
         for i, entry in enumerate(self.history, 1):
-            print(f"{i}. [{entry['timestamp']}] {entry['query'][:60]}{'...' if len(entry['query']) > 60 else ''}")
+            print(f"{i}. [{entry['timestamp']:{_HISTORY_TIME_FORMAT}}] {entry['query'][:60]}{'...' if len(entry['query']) > 60 else ''}")
             print(f"   Params: {entry['params']}")
             print(f"   Affected: {entry['affected']} rows")
             print()
@@ -689,7 +989,7 @@ class RealTimeDBManager:
 
         while True:
             print("")
-            user_input = input("📝 > ").strip()
+            user_input = fast_input("📝 > ").strip()
             
             if user_input.lower() == 'exit':
                 break
@@ -712,25 +1012,23 @@ class RealTimeDBManager:
             
             # Print explanation with risk level indication
             risk_level = analysis.get('risk_level', 'none')
-            risk_icon = {
-                'none': '  ',
-                'low': '🟢',
-                'medium': '🟡',
-                'high': '🟠',
-                'critical': '🔴'
-            }.get(risk_level, '  ')
+            risk_icon = _RISK_ICONS.get(risk_level, '  ')
             
             print(f"\n{risk_icon} {analysis['explanation']}")
             print(f"  {analysis['details']}")
             
+            # Nothing runnable was found, so there is nothing to confirm
+            if analysis['action'] == 'Unknown':
+                continue
+            
             # For high-risk operations, make confirmation more explicit
-            if risk_level in ['high', 'critical']:
-                confirm = input(f"⚠ This is a {risk_level} risk operation. Type 'confirm' to proceed: ")
+            if risk_level in _HIGH_RISK_LEVELS:
+                confirm = fast_input(f"⚠ This is a {risk_level} risk operation. Type 'confirm' to proceed: ")
                 if confirm.lower() != 'confirm':
                     print("Operation cancelled.")
                     continue
             else:
-                confirm = input("Execute this operation? (y/n): ")
+                confirm = fast_input("Execute this operation? (y/n): ")
                 if confirm.lower() != 'y':
                     print("Operation cancelled.")
                     continue
@@ -739,28 +1037,12 @@ class RealTimeDBManager:
             self.execute_analyzed_query(analysis)
             
     def _show_help(self):
-        print("\n📋 Help Information")
-        print("------------------")
-        print("1. Query Types:")
-        print("   - Natural language: 'show all users where age > 25'")
-        print("   - Direct SQL: 'SELECT * FROM users WHERE age > 25'")
-        print("   - Schema exploration: 'show tables', 'describe users'")
-        print("   - Operations: 'add new user', 'update user set name where id = 1'")
-        print("\n2. Commands:")
-        print("   - exit: Close the application")
-        print("   - history: Show history of executed queries")
-        print("   - help: Show this help information")
-        print("\n3. Supported Operations:")
-        print("   - SELECT: Retrieve data from tables")
-        print("   - INSERT: Add new records")
-        print("   - UPDATE: Modify existing records")
-        print("   - DELETE: Remove records")
-        print("   - SCHEMA: View database structure")
+        sys.stdout.write(_HELP_TEXT)
 
 # Main program
-if _name_ == "_main_":
+if __name__ == "__main__":
     # Create the database manager
-    db_manager = RealTimeDBManager()
+    db_manager = RealTimeDBManager(pretty='--pretty' in sys.argv[1:])
     
     try:
         # Run the interactive session
@@ -1,27 +1,103 @@
-import sqlite3
-import os
+import atexit
+import sys
+from operator import itemgetter
+
+# sqlite3 and urllib.parse are imported by the functions that use them, so
+# importing this module stays cheap until a database is actually opened
+
+# Connection settings applied once per connection, shared with sql_reasoning:
+# a 64 MiB page cache, in-memory temp tables and memory-mapped reads; writable
+# file connections also switch to write-ahead logging with NORMAL sync.
+# sqlite3.connect's default timeout already waits on a locked database.
+CONNECTION_PRAGMAS = ("cache_size=-65536", "temp_store=MEMORY", "mmap_size=268435456")
+WRITE_PRAGMAS = ("journal_mode=WAL", "synchronous=NORMAL")
+
+# Open connections by database path and access mode, reused by every later
+# connect call and closed when the interpreter exits
+_conn_cache = {}
+
+# Table names by connection, with the schema version they were read at; the
+# version only changes after DDL, so unchanged schemas skip sqlite_master
+_tables_cache = {}
+
+def close_connection(connection):
+    """Close a connection and forget it in the connection and table caches."""
+    for key, conn in list(_conn_cache.items()):
+        if conn is connection:
+            del _conn_cache[key]
+    _tables_cache.pop(connection, None)
+    connection.close()
+
+def _close_cached_connections():
+    for conn in _conn_cache.values():
+        conn.close()
+    _conn_cache.clear()
+    _tables_cache.clear()
+
+atexit.register(_close_cached_connections)
+
+def fast_input(prompt):
+    """Read one line, skipping input()'s extra flushes when stdin is piped."""
+    # Terminals keep input() for its line editing
+    if sys.stdin.isatty():
+        return input(prompt)
+    if prompt:
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip("\n")
 
 #function to connect to sql database 
-def connect_to_sqlite_db(db_path):
-    """Connect to a SQLite database at the given path."""
-    if not os.path.exists(db_path):
-        print(f"Error: Database file '{db_path}' does not exist.")
-        return None
+def connect_to_sqlite_db(db_path, read_only=False):
+    """Connect to a SQLite database at the given path, reusing an open connection."""
+    import sqlite3
+    import urllib.parse
     
+    key = (db_path, read_only)
+    conn = _conn_cache.get(key)
+    if conn is not None:
+        try:
+            conn.execute("SELECT 1")
+            return conn
+        except sqlite3.Error:
+            # Closed elsewhere or unusable; open a fresh one
+            del _conn_cache[key]
+    
+    conn = None
     try:
-        conn = sqlite3.connect(db_path)
+        # Neither mode creates a missing file, so opening doubles as the
+        # existence check; read-only connections take no write locks and
+        # set up no journal files
+        mode = "ro" if read_only else "rw"
+        conn = sqlite3.connect(f"file:{urllib.parse.quote(db_path)}?mode={mode}", uri=True)
+        pragmas = CONNECTION_PRAGMAS if read_only else WRITE_PRAGMAS + CONNECTION_PRAGMAS
+        for pragma in pragmas:
+            conn.execute(f"PRAGMA {pragma}")
+        _conn_cache[key] = conn
         return conn
     except sqlite3.Error as e:
-        print(f"Error connecting to database: {e}")
+        # A file that opened but is not a usable database fails in a PRAGMA
+        if conn is not None:
+            conn.close()
+        if e.sqlite_errorcode == sqlite3.SQLITE_CANTOPEN:
+            print(f"Error: Database file '{db_path}' does not exist.")
+        else:
+            print(f"Error connecting to database: {e}")
         return None
 
 def get_tables(connection):
     """Get all tables from the connected database."""
+    import sqlite3
+    
     try:
-        cursor = connection.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [table[0] for table in cursor.fetchall()]
-        return tables
+        version = connection.execute("PRAGMA schema_version;").fetchone()[0]
+        cached = _tables_cache.get(connection)
+        if cached is None or cached[0] != version:
+            rows = connection.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            cached = _tables_cache[connection] = (version, list(map(itemgetter(0), rows)))
+        return list(cached[1])
     except sqlite3.Error as e:
         print(f"Error getting tables: {e}")
         return []
@@ -34,44 +110,49 @@ def main():
     db_path = input("Enter the path to your SQLite database: ")
     
     # Connect to the database
-    connection = connect_to_sqlite_db(db_path)
+    connection = connect_to_sqlite_db(db_path, read_only=True)
     if not connection:
         print("Failed to connect to database.")
         return
     
-    print(f"Successfully connected to database: {db_path}")
-    
-    # Get tables
-    tables = get_tables(connection)
-    
-    if not tables:
-        print("No tables found in the database.")
-        connection.close()
-        return
-    
-    # Display tables 
-    print("\nAvailable tables:")
-    for i, table in enumerate(tables, 1):
-        print(f"{i}. {table}")
-    
-    #  select a table according to the user 
-    while True:
-        try:
-            selection = input("\nSelect a table (enter the number): ")
-            table_index = int(selection) - 1
+    try:
+        print(f"Successfully connected to database: {db_path}")
+        
+        # Get tables
+        tables = get_tables(connection)
+        
+        if not tables:
+            print("No tables found in the database.")
+            return
+        
+        # Display tables 
+        print("\nAvailable tables:")
+        print("\n".join(f"{i}. {table}" for i, table in enumerate(tables, 1)))
+        
+        #  select a table according to the user 
+        while True:
+            try:
+                selection = fast_input("\nSelect a table (enter the number): ").strip()
+            except (EOFError, KeyboardInterrupt):
+                # End of input or Ctrl-C ends the selection without a choice
+                print("\nNo table selected.")
+                return
+            
+            if not selection.isdecimal():
+                print("Please enter a valid number.")
+                continue
             
+            table_index = int(selection) - 1
             if 0 <= table_index < len(tables):
                 selected_table = tables[table_index]
                 print(f"You selected: {selected_table}")
                 break
             else:
                 print(f"Please enter a number between 1 and {len(tables)}.")
-        except ValueError:
-            print("Please enter a valid number.")
-    
-    # Close the connection if any 
-    connection.close()
-    print("Connection closed.")
+    finally:
+        # Close the connection on every way out of main
+        close_connection(connection)
+        print("Connection closed.")
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()